@@ -30,7 +30,7 @@ from testfixtures.replace import (
 )
 from testfixtures.shouldraise import ShouldRaise, should_raise, ShouldAssert
 from testfixtures.shouldwarn import ShouldWarn, ShouldNotWarn
-from testfixtures.tempdirectory import TempDirectory, tempdir
+from testfixtures.tempdirectory import TempDirectory, Changes, FileHash, tempdir
 from testfixtures.utils import wrap, generator
 
 
@@ -43,7 +43,9 @@ test_time = mock_time
 test_time.__test__ = False  # type: ignore[attr-defined]
 
 __all__ = [
+    'Changes',
     'Comparison',
+    'FileHash',
     'LogCapture',
     'MappingComparison',
     'OutputCapture',
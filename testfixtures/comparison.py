@@ -1,6 +1,7 @@
 import re
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from collections.abc import Iterable as IterableABC
+from dataclasses import fields, is_dataclass
 from datetime import datetime, time
 from decimal import Decimal
 from difflib import unified_diff
@@ -8,12 +9,14 @@ from functools import partial as partial_type, reduce
 from operator import __or__
 from pathlib import Path
 from pprint import pformat
+from time import perf_counter
 from types import GeneratorType
 from typing import (
     Any, Sequence, TypeVar, List, Mapping, Pattern,
-    Callable, Iterable, cast, Type
+    Callable, Iterable, Hashable, cast, Type
 )
 from unittest.mock import call as unittest_mock_call
+from weakref import ref
 
 from testfixtures import not_there, singleton
 from testfixtures.mock import parent_name, mock_call, _Call
@@ -531,6 +534,14 @@ def _shared_mro(x: Any, y: Any) -> Iterable[Type]:
 
 _unsafe_iterables = str, bytes, dict
 
+# Comparers that reach the same conclusion as == when used for exactly these types:
+_single_pass_comparers: Registry = {
+    dict: compare_dict,
+    list: compare_sequence,
+    tuple: compare_tuple,
+    set: compare_set,
+}
+
 
 class AlreadySeen:
 
@@ -549,6 +560,247 @@ class AlreadySeen:
             return self.obj == other
 
 
+_plain_eq = {
+    dict.__eq__: 'mapping',
+    OrderedDict.__eq__: 'mapping',
+    list.__eq__: 'sequence',
+    tuple.__eq__: 'sequence',
+    set.__eq__: 'set',
+    frozenset.__eq__: 'set',
+}
+
+
+def _dataclass_eq(type_: type) -> bool:
+    # dataclass() leaves any __eq__ defined on the class in place while still
+    # recording eq=True, so check that __eq__ is the one it generated, which
+    # is always compiled from a string:
+    for class_ in type_.__mro__:
+        if '__eq__' in vars(class_):
+            break
+    params = vars(class_).get('__dataclass_params__')
+    code = getattr(vars(class_)['__eq__'], '__code__', None)
+    return (
+        params is not None and params.eq and
+        code is not None and code.co_filename == '<string>'
+    )
+
+
+class _Fingerprinter:
+
+    def __init__(
+            self,
+            strict: bool,
+            ignore_attributes: Iterable[str] | dict[type, Iterable[str]],
+            cache: dict[int, tuple[Any, int]] | None,
+            exhaustive: bool = False,
+    ):
+        self.strict = strict
+        self.ignore_attributes = ignore_attributes
+        self.cache = cache
+        # If exhaustive, carry on fingerprinting siblings of anything that can't be
+        # fingerprinted so that as much of the structure as possible ends up in the memo.
+        self.exhaustive = exhaustive
+        # The fingerprints of every container seen, by id. The containers are kept
+        # alive by self._seen so that their ids can't be re-used.
+        self.memo: dict[int, int] = {}
+        self._seen: List[Any] = []
+        self._immutable = set[int]()
+        self._active = set[int]()
+
+    def _ignore(self, obj: Any) -> Iterable[str]:
+        ignore = self.ignore_attributes
+        if isinstance(ignore, dict):
+            ignore = ignore.get(type(obj), ())
+        return ignore
+
+    def _attributes(self, obj: Any) -> tuple[dict[str, Any] | None, bool]:
+        if isinstance(obj, type):
+            return None, True
+        if is_dataclass(obj) and _dataclass_eq(type(obj)):
+            ignore = set(self._ignore(obj))
+            attrs = {f.name: getattr(obj, f.name) for f in fields(obj)
+                     if f.compare and f.name not in ignore}
+            return attrs, obj.__dataclass_params__.frozen  # type: ignore[union-attr]
+        if type(obj).__eq__ is object.__eq__:
+            if isinstance(obj, GeneratorType) or (
+                    isinstance(obj, IterableABC) and not isinstance(obj, _unsafe_iterables)
+            ):
+                raise TypeError('cannot fingerprint iterable: %s' % _short_repr(obj))
+            return _extract_attrs(obj, self._ignore(obj)), False
+        return None, True
+
+    def __call__(self, obj: Any) -> int:
+        id_ = id(obj)
+        fingerprint = self.memo.get(id_)
+        if fingerprint is not None:
+            return fingerprint
+        if self.cache is not None:
+            cached = self.cache.get(id_)
+            if cached is not None:
+                self.memo[id_] = cached[1]
+                self._immutable.add(id_)
+                return cached[1]
+
+        type_ = type(obj)
+        kind = _plain_eq.get(type_.__eq__)
+        tag: Any = type_ if self.strict else kind
+        if kind is None:
+            attrs, immutable = self._attributes(obj)
+            if attrs is None:
+                if self.strict:
+                    return hash((type_, hash(obj)))
+                return hash(obj)
+            kind = 'object'
+            tag = type_
+
+        if id_ in self._active:
+            raise TypeError('cannot fingerprint recursive structure: %s' % _short_repr(obj))
+        self._active.add(id_)
+        try:
+            if kind == 'mapping':
+                immutable = False
+                fingerprint = hash((tag, frozenset(
+                    zip(map(hash, obj.keys()), self._children(obj.values()))
+                )))
+            elif kind == 'sequence':
+                items = tuple(self._children(obj))
+                immutable = isinstance(obj, tuple) and all(
+                    id(item) in self._immutable or not self._container(item) for item in obj
+                )
+                fingerprint = hash((tag, items))
+            elif kind == 'set':
+                immutable = type_ is frozenset
+                fingerprint = hash((tag, obj if immutable else frozenset(obj)))
+            else:
+                assert attrs is not None
+                fingerprint = hash((tag, frozenset(
+                    zip(attrs.keys(), self._children(attrs.values()))
+                )))
+                immutable = immutable and all(
+                    id(value) in self._immutable or not self._container(value)
+                    for value in attrs.values()
+                )
+        finally:
+            self._active.remove(id_)
+
+        self.memo[id_] = fingerprint
+        self._seen.append(obj)
+        if immutable:
+            self._immutable.add(id_)
+            if self.cache is not None:
+                self.cache[id_] = obj, fingerprint
+        return fingerprint
+
+    def _children(self, values: Iterable[Any]) -> List[int]:
+        fingerprints = []
+        error = None
+        for value in values:
+            try:
+                fingerprints.append(self(value))
+            except TypeError as e:
+                if not self.exhaustive:
+                    raise
+                error = e
+        if error is not None:
+            raise error
+        return fingerprints
+
+    def _container(self, obj: Any) -> bool:
+        return id(obj) in self.memo
+
+
+def fingerprint(
+        obj: Any,
+        strict: bool = False,
+        ignore_attributes: Iterable[str] | dict[type, Iterable[str]] = (),
+        cache: dict[int, tuple[Any, int]] | None = None,
+) -> int:
+    """
+    Return a structural hash of the supplied object, descending into
+    dictionaries, lists, tuples, sets and the attributes of objects that
+    do not implement ``__eq__``.
+    Objects that :func:`compare` would find to be the same will have the
+    same fingerprint, so objects with different fingerprints will never
+    compare as the same. This makes fingerprints useful for indexing large
+    numbers of expected objects. The one exception is that sets will never have
+    the same fingerprint as lists or tuples, even though :func:`compare` will
+    find them to be the same if their items are iterated in the same order.
+
+    Other objects are fingerprinted using their :func:`hash` and,
+    like :func:`hash`, a :class:`TypeError` is raised if the object, or anything
+    nested within it, cannot be fingerprinted. This includes unhashable objects
+    such as :class:`Comparison` objects, along with
+    generators and iterables that :func:`compare` would need to consume.
+
+    :param strict: If ``True``, the fingerprint will take the type of each
+                   object into account, as :func:`compare` does when
+                   ``strict=True``.
+
+    :param ignore_attributes: Either a sequence of attribute names to be
+                              ignored or a mapping of type to attribute
+                              names to be ignored for that type, as
+                              described in :func:`compare_object`.
+
+    :param cache:
+      If supplied, a dictionary in which the fingerprints of immutable containers,
+      such as tuples, frozensets and frozen dataclasses, will be stored so that
+      they are not worked out again by later calls. A reference to each object
+      is kept in the dictionary. A cache should only be used with one
+      combination of ``strict`` and ``ignore_attributes``.
+    """
+    return _Fingerprinter(strict, ignore_attributes, cache)(obj)
+
+
+class CompareProfile:
+    """
+    Records where the work is done during a call to :func:`compare`.
+    Pass an instance as the ``profile`` parameter and inspect it once
+    :func:`compare` has returned or raised.
+    """
+
+    def __init__(self) -> None:
+        #: The number of pairs of objects compared, including nested ones.
+        self.nodes: int = 0
+        #: A mapping of comparer name to the number of times it was called.
+        self.calls: dict[str, int] = defaultdict(int)
+        #: A mapping of comparer name to the time, in seconds, spent in that
+        #: comparer, excluding time spent comparing nested objects.
+        #: Time spent on pairs found equal using ``==`` is recorded against
+        #: ``'=='``.
+        self.timings: dict[str, float] = defaultdict(float)
+        #: The breadcrumbs of the most deeply nested comparison made.
+        self.deepest: str = ''
+        #: The length of the message produced, in characters.
+        self.message_length: int = 0
+        self._depth = 0
+        self._stack: List[tuple[float, float]] = []
+
+    def start(self, breadcrumbs: List[str]) -> None:
+        self.nodes += 1
+        if len(breadcrumbs) > self._depth:
+            self._depth = len(breadcrumbs)
+            self.deepest = ''.join(breadcrumbs[1:])
+        self._stack.append((perf_counter(), 0.0))
+
+    def stop(self, comparer: Comparer | None) -> None:
+        started, nested = self._stack.pop()
+        elapsed = perf_counter() - started
+        name = '==' if comparer is None else getattr(comparer, '__name__', repr(comparer))
+        self.calls[name] += 1
+        self.timings[name] += elapsed - nested
+        if self._stack:
+            started, nested = self._stack[-1]
+            self._stack[-1] = started, nested + elapsed
+
+    def __str__(self) -> str:
+        lines = ['%i nodes, deepest at %s, message length %i' % (
+            self.nodes, self.deepest or 'top level', self.message_length
+        )]
+        for name, timing in sorted(self.timings.items(), key=lambda i: i[1], reverse=True):
+            lines.append('%s: %i calls, %.6fs' % (name, self.calls[name], timing))
+        return '\n'.join(lines)
+
+
 class CompareContext:
     """
     Stores the context of the current comparison in process during a call to
@@ -564,6 +816,9 @@ class CompareContext:
             ignore_eq: bool = False,
             comparers: Registry | None = None,
             options: dict[str, Any] | None = None,
+            profile: CompareProfile | None = None,
+            fingerprints: bool = False,
+            single_pass: bool = False,
     ):
         self.registries = []
         if comparers:
@@ -576,6 +831,11 @@ class CompareContext:
         self.strict: bool = strict
         self.ignore_eq: bool = ignore_eq
         self.options: dict[str, Any] = options or {}
+        self.profile: CompareProfile | None = profile
+        self.fingerprints: bool = fingerprints
+        self.single_pass: bool = single_pass
+        self._fingerprints: dict[int, int] = {}
+        self._fingerprinted: List[Any] = []
         self.message: str = ''
         self.breadcrumbs: List[str] = []
         self._seen: dict[int, str] = {}
@@ -655,8 +915,41 @@ class CompareContext:
     def simple_equals(self, x: Any, y: Any) -> bool:
         return not (self.strict or self.ignore_eq) and x == y
 
+    def _fingerprint(self, *objs: Any) -> None:
+        fingerprinter = _Fingerprinter(
+            strict=False,
+            ignore_attributes=self.get_option('ignore_attributes', ()),
+            cache=None,
+            exhaustive=True,
+        )
+        for obj in objs:
+            try:
+                fingerprinter(obj)
+            except TypeError:
+                pass
+        self._fingerprints = fingerprinter.memo
+        # keep the objects alive so that their ids remain valid:
+        self._fingerprinted = fingerprinter._seen
+
+    def _known_different(self, x: Any, y: Any) -> bool:
+        # Objects with different fingerprints can never be equal.
+        fingerprints = self._fingerprints
+        x_fingerprint = fingerprints.get(id(x))
+        if x_fingerprint is None:
+            return False
+        y_fingerprint = fingerprints.get(id(y))
+        return y_fingerprint is not None and x_fingerprint != y_fingerprint
+
+    def _comparer_decides(self, x: Any, y: Any) -> bool:
+        # True if the comparer for these objects will find them to be the same
+        # if and only if they are equal, so there's no need to check equality first.
+        type_ = type(x)
+        comparer = _single_pass_comparers.get(type_)
+        return comparer is not None and type(y) is type_ and self._lookup(x, y) is comparer
+
     def different(self, x: Any, y: Any, breadcrumb: str) -> bool | str | None:
 
+        top_level = not self.breadcrumbs
         x = self._break_loops(x, breadcrumb)
         y = self._break_loops(y, breadcrumb)
 
@@ -665,16 +958,32 @@ class CompareContext:
         existing_message = self.message
         self.message = ''
         current_message = ''
+        profile = self.profile
+        comparer: Comparer | None = None
+        if profile is not None:
+            profile.start(self.breadcrumbs)
         try:
 
-            if type(y) is AlreadySeen or not (self.strict or self.ignore_eq):
+            skip_equality = False
+            if self.single_pass:
+                if x is y:
+                    return False
+                skip_equality = self._comparer_decides(x, y)
+
+            if not skip_equality and (type(y) is AlreadySeen or not (
+                    self.strict or self.ignore_eq or self._known_different(x, y)
+            )):
                 try:
                     if x == y:
                         return False
                 except RecursionError:
                     pass
 
-            comparer: Comparer = self._lookup(x, y)
+            # Fingerprints are only worth the cost once the objects are known to differ:
+            if top_level and self.fingerprints and not (self.strict or self.ignore_eq):
+                self._fingerprint(x, y)
+
+            comparer = self._lookup(x, y)
 
             result = comparer(x, y, self)
             specific_comparer = comparer is not compare_simple
@@ -694,9 +1003,96 @@ class CompareContext:
 
         finally:
             self.message = existing_message + current_message
+            if profile is not None:
+                profile.stop(comparer)
             self.breadcrumbs.pop()
 
 
+def _message(context: CompareContext, x: Any, y: Any) -> str | None:
+    if context.different(x, y, ''):
+        return context.message
+    return None
+
+
+class CompareCache:
+    """
+    A cache of the results of :func:`compare` for pairs of objects that are
+    compared repeatedly. Pass the same instance as the ``cache`` parameter
+    to each call.
+
+    Only pairs of objects that are hashable by value, such as tuples, frozensets
+    and frozen dataclasses, are cached and they must not be mutated while cached.
+    Results are looked up using the identity and hash of both objects along
+    with the parameters passed to :func:`compare`. Calls passing ``comparers``
+    are never cached.
+
+    :param maxsize: The maximum number of results to keep. Once reached, the
+                    least recently used result is discarded.
+    """
+
+    def __init__(self, maxsize: int = 128) -> None:
+        self.maxsize = maxsize
+        #: The number of calls to :func:`compare` answered from this cache.
+        self.hits: int = 0
+        #: The number of calls to :func:`compare` that could not be answered
+        #: from this cache.
+        self.misses: int = 0
+        self._results: OrderedDict[Hashable, tuple[Any, Any, str | None]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def clear(self) -> None:
+        """Discard all cached results."""
+        self._results.clear()
+
+    def _key(self, context: CompareContext, x: Any, y: Any) -> Hashable | None:
+        if len(context.registries) > 1:
+            return None
+        for obj in x, y:
+            if type(obj).__hash__ is object.__hash__:
+                return None
+        try:
+            key = (
+                id(x), hash(x), id(y), hash(y),
+                context.x_label, context.y_label,
+                context.recursive, context.strict, context.ignore_eq,
+                tuple(sorted(context.options.items())),
+            )
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _hold(self, obj: Any, key: Hashable) -> Any:
+        # Hold a weak reference, where possible, so that cached objects can be
+        # freed, discarding their results before their id can be re-used.
+        try:
+            return ref(obj, lambda _: self._results.pop(key, None))
+        except TypeError:
+            return obj
+
+    def message(self, context: CompareContext, x: Any, y: Any) -> str | None:
+        """
+        Return the message describing the differences between ``x`` and ``y``,
+        using a cached result if one is available.
+        """
+        key = self._key(context, x, y)
+        if key is not None:
+            entry = self._results.get(key)
+            if entry is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+        self.misses += 1
+        message = _message(context, x, y)
+        if key is not None:
+            self._results[key] = self._hold(x, key), self._hold(y, key), message
+            if len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        return message
+
+
 def _resolve_lazy(source: Any) -> str:
     return str(source() if callable(source) else source)
 
@@ -719,6 +1115,10 @@ def compare(
         strict: bool = False,
         ignore_eq: bool = False,
         comparers: Registry | None = None,
+        profile: CompareProfile | None = None,
+        cache: CompareCache | None = None,
+        fingerprints: bool = False,
+        single_pass: bool = False,
         **options: Any
 ) -> str | None:
     """
@@ -774,6 +1174,29 @@ def compare(
                       be added to the comparer registry for the duration
                       of this call.
 
+    :param profile: If supplied, should be a :class:`~testfixtures.comparison.CompareProfile`
+                    that will be populated with information about where the
+                    work was done during this call.
+
+    :param cache: If supplied, should be a :class:`~testfixtures.comparison.CompareCache`
+                  that will be used to avoid repeating the comparison of
+                  objects that have been compared before.
+
+    :param fingerprints: If ``True``, the :func:`~testfixtures.comparison.fingerprint`
+                         of every container within the objects being compared
+                         will be worked out once they are found not to be equal,
+                         and equality checks
+                         will be skipped for any pair of nested objects whose
+                         fingerprints differ. This avoids repeatedly checking the
+                         equality of the same parts of large, deeply nested structures
+                         that differ in only a few places.
+
+    :param single_pass: If ``True``, equality will not be checked before comparing
+                        dictionaries, lists, tuples and sets that have the standard
+                        comparers. Instead, the comparer will both work out whether
+                        they are the same and describe any differences in one pass
+                        over their contents.
+
     Any other keyword parameters supplied will be passed to the functions
     that end up doing the comparison. See the
     :mod:`API documentation below <testfixtures.comparison>`
@@ -786,16 +1209,24 @@ def compare(
         x_label = x_label or 'expected'
         y_label = y_label or 'actual'
 
-    context = CompareContext(x_label, y_label, recursive, strict, ignore_eq, comparers, options)
+    context = CompareContext(
+        x_label, y_label, recursive, strict, ignore_eq, comparers, options,
+        profile, fingerprints, single_pass
+    )
     x, y = context.extract_args(args, x, y, expected, actual)
-    if not context.different(x, y, ''):
+    if cache is None:
+        message = _message(context, x, y)
+    else:
+        message = cache.message(context, x, y)
+    if message is None:
         return None
 
-    message = context.message
     if prefix:
         message = _resolve_lazy(prefix) + ': ' + message
     if suffix:
         message += '\n' + _resolve_lazy(suffix)
+    if profile is not None:
+        profile.message_length = len(message)
 
     if raises:
         raise AssertionError(message)
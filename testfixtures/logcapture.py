@@ -1,18 +1,461 @@
+import asyncio
 import atexit
 import logging
+import multiprocessing
+import pickle
+import threading
 import warnings
-from collections import defaultdict
-from collections.abc import Iterable
+from collections import Counter, defaultdict, deque
+from copy import copy
+from array import array
+from collections.abc import Iterable, Iterator, Mapping
+from contextvars import ContextVar, copy_context
+from heapq import merge
+from itertools import count, islice
 from logging import LogRecord
+from logging.handlers import QueueHandler, QueueListener
+from multiprocessing.context import BaseContext
 from pprint import pformat
+from tempfile import TemporaryFile
 from types import TracebackType
-from typing import List, Tuple, Sequence, Callable, Any, Self
+from typing import Deque, List, Tuple, Sequence, Callable, Any, Self
 
-from .comparison import SequenceComparison, compare
+from .comparison import MappingComparison, SequenceComparison, compare
 from .utils import wrap
 
 
-class LogCapture(logging.Handler):
+class CompactRecord:
+    """
+    A lightweight stand-in for a :class:`~logging.LogRecord` that is captured
+    by a :class:`LogCapture` when ``compact=True`` is passed.
+    Only the row extracted using the ``attributes`` passed to the :class:`LogCapture`
+    is kept, along with the attributes of the original record that are needed to
+    check it.
+    """
+
+    __slots__ = (
+        'name', 'levelno', 'levelname', 'created', 'thread', 'task', 'task_context',
+        'row', 'checked',
+    )
+
+    def __init__(self, record: LogRecord, row: Any) -> None:
+        self.name = record.name
+        self.levelno = record.levelno
+        self.levelname = record.levelname
+        self.created = record.created
+        self.thread = record.thread
+        self.task = getattr(record, 'task', None)
+        self.task_context = getattr(record, 'task_context', None)
+        #: The row extracted from the original record.
+        self.row = row
+        self.checked = False
+
+    def __repr__(self) -> str:
+        return '<CompactRecord: %s, %s, %r>' % (self.name, self.levelname, self.row)
+
+
+class _SpooledRecord:
+    # A record read back from a _Spool, whose checked flag is kept in the spool.
+
+    __slots__ = ('_spool', '_index', 'name', 'levelno', 'levelname', 'created', 'thread', 'row')
+
+    def __init__(self, spool: '_Spool', index: int, data: tuple[Any, ...]) -> None:
+        self._spool = spool
+        self._index = index
+        self.name, self.levelname, self.created, self.thread, self.row = data
+        self.levelno = spool.levelnos[index]
+
+    @property
+    def checked(self) -> bool:
+        return bool(self._spool.checked[self._index])
+
+    @checked.setter
+    def checked(self, value: bool) -> None:
+        self._spool.checked[self._index] = value
+
+    def __repr__(self) -> str:
+        return '<SpooledRecord: %s, %s, %r>' % (self.name, self.levelname, self.row)
+
+
+class _Spool(Sequence[_SpooledRecord]):
+    # Records pickled to a temporary file, with only their offsets, levels and
+    # checked flags kept in memory.
+
+    def __init__(self, extract: Callable[[LogRecord], Any]) -> None:
+        self.extract = extract
+        self.file = TemporaryFile()
+        self.offsets = array('Q')
+        self.levelnos = array('i')
+        self.checked = bytearray()
+        self.end = 0
+        self.reading = False
+        # Records may be appended by one thread while being read by another,
+        # and both need to position the file:
+        self.lock = threading.Lock()
+
+    def append(self, record: LogRecord) -> None:
+        data = pickle.dumps(
+            (record.name, record.levelname, record.created, record.thread,
+             self.extract(record)),
+            pickle.HIGHEST_PROTOCOL
+        )
+        with self.lock:
+            if self.reading:
+                self.file.seek(self.end)
+                self.reading = False
+            self.file.write(data)
+            self.offsets.append(self.end)
+            self.levelnos.append(record.levelno)
+            self.checked.append(record.checked)  # type: ignore[attr-defined]
+            self.end += len(data)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _load(self, index: int) -> _SpooledRecord:
+        with self.lock:
+            self.reading = True
+            self.file.seek(self.offsets[index])
+            data = pickle.load(self.file)
+        return _SpooledRecord(self, index, data)
+
+    def __getitem__(self, index: int) -> _SpooledRecord:  # type: ignore[override]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('record index out of range')
+        return self._load(index)
+
+    def __iter__(self) -> Iterator[_SpooledRecord]:
+        for index in range(len(self)):
+            yield self._load(index)
+
+    def mark_all_checked(self) -> None:
+        with self.lock:
+            self.checked[:] = b'\x01' * len(self.checked)
+
+    def unchecked_rows(self, level: int) -> list[Any]:
+        # Only the records that need to be reported are read back:
+        return [
+            self._load(index).row
+            for index, (levelno, checked) in enumerate(zip(self.levelnos, self.checked))
+            if levelno >= level and not checked
+        ]
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class _SpooledRows(Sequence[Any]):
+    # The rows of the records in a _Spool, read back as needed.
+
+    def __init__(self, spool: _Spool) -> None:
+        self.spool = spool
+
+    def __len__(self) -> int:
+        return len(self.spool)
+
+    def __getitem__(self, index: int) -> Any:  # type: ignore[override]
+        return self.spool[index].row
+
+    def __iter__(self) -> Iterator[Any]:
+        for record in self.spool:
+            yield record.row
+
+
+# The attributes every LogRecord has, along with those added by logging and LogCapture:
+_record_attributes = frozenset(vars(LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'checked', 'task', 'task_context'
+}
+
+_missing = object()
+
+
+def event_fields(record: LogRecord) -> dict[str, Any]:
+    """
+    Return a dictionary of the event fields for the supplied
+    :class:`~logging.LogRecord`. This contains the name of the logger
+    as ``logger`` and the name of the level as ``level``.
+    If the message logged was a mapping, such as the event dictionary passed
+    by :mod:`structlog`, its items are then included, otherwise the message
+    is included as ``event``. Any attributes added to the record, such as
+    by passing ``extra`` when logging, are included last.
+
+    This is used for the rows of a :class:`LogCapture` when ``structured=True``
+    is passed.
+    """
+    fields = {'logger': record.name, 'level': record.levelname}
+    if isinstance(record.msg, Mapping):
+        fields.update(record.msg)
+    else:
+        fields['event'] = record.getMessage()
+    for name, value in vars(record).items():
+        if name not in _record_attributes:
+            fields[name] = value
+    return fields
+
+
+def _event_field(record: LogRecord, field: str) -> Any:
+    # Look up a single field from event_fields() without building the whole dictionary.
+    if isinstance(record, CompactRecord):
+        return record.row.get(field, _missing)
+    attributes = vars(record)
+    if field in attributes and field not in _record_attributes:
+        return attributes[field]
+    if isinstance(record.msg, Mapping):
+        if field in record.msg:
+            return record.msg[field]
+    elif field == 'event':
+        return record.getMessage()
+    if field == 'logger':
+        return record.name
+    if field == 'level':
+        return record.levelname
+    return _missing
+
+
+def _picklable(obj: Any) -> bool:
+    try:
+        pickle.dumps(obj)
+    except Exception:
+        return False
+    return True
+
+
+class _ProcessQueueHandler(QueueHandler):
+    # Sends records from a child process to the LogCapture in the parent process.
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        # Make the record picklable while keeping the message and any exception
+        # information as text. Event dictionaries are kept where they can be pickled,
+        # so they can still be used for structured rows:
+        record = copy(record)
+        if not (isinstance(record.msg, Mapping) and _picklable(record.msg)):
+            record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _process_initializer(
+        queue: Any, names: Tuple[str | None, ...], level: int, levels: Mapping[str, int]
+) -> None:
+    # Run in each child process to send its logging to the LogCapture in the parent.
+    handler = _ProcessQueueHandler(queue)
+    for name in names:
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
+        logger.filters = []
+        logger.handlers = [handler]
+        logger.disabled = False
+    for logger_name, logger_level in levels.items():
+        logging.getLogger(logger_name).setLevel(logger_level)
+
+
+class _ProcessListener(QueueListener):
+    # Hands records from child processes to the LogCapture and signals when
+    # markers sent by flush() have been reached, so the thread need not be restarted.
+
+    def __init__(self, queue: Any, handler: logging.Handler) -> None:
+        super().__init__(queue, handler)
+        self.markers = count()
+        self.flushed: dict[int, threading.Event] = {}
+
+    def flush(self) -> None:
+        marker = next(self.markers)
+        event = self.flushed[marker] = threading.Event()
+        self.queue.put_nowait(marker)
+        event.wait()
+
+    def handle(self, record: Any) -> None:
+        if isinstance(record, int):
+            self.flushed.pop(record).set()
+        else:
+            super().handle(record)
+
+
+class _CheckMethods:
+    # The methods for checking captured records shared by LogCapture and LogCaptureView.
+
+    records: List[LogRecord] | Deque[LogRecord]
+    recursive_check: bool
+    ensure_checks_above: int
+    structured: bool
+    # Returns the rows extracted from the records:
+    _actual_rows: Callable[[], List[Any] | Deque[Any]]
+
+    def _dropped_unchecked_count(self, level: int) -> int:
+        return 0
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _expected(self, expected: tuple[Any, ...]) -> tuple[Any, ...]:
+        # Expected event dictionaries only need to match part of a structured row:
+        if not self.structured:
+            return expected
+        return tuple(
+            MappingComparison(e, partial=True, recursive=self.recursive_check)
+            if isinstance(e, Mapping) else e
+            for e in expected
+        )
+
+    def __getitem__(self, index: int) -> Any:
+        return self._actual_rows()[index]
+
+    def __contains__(self, what: Any) -> bool:
+        item: Any
+        for i, item in enumerate(self._actual_rows()):
+            if what == item:
+                self.records[i].checked = True
+                return True
+        return False
+
+    def mark_all_checked(self) -> None:
+        """
+        Mark all captured events as checked.
+        This should be called if you have made assertions about logging
+        other than through :class:`LogCapture` methods.
+        """
+        records = self.records
+        if isinstance(records, _Spool):
+            records.mark_all_checked()
+            return
+        for record in records:
+            record.checked = True
+
+    def ensure_checked(self, level: int | None = None) -> None:
+        """
+        Ensure every entry logged above the specified `level` has been checked.
+        Raises an :class:`AssertionError` if this is not the case.
+
+        :param level: the logging level, defaults to :attr:`ensure_checks_above`.
+        """
+        if level is None:
+            level = self.ensure_checks_above
+        if level == logging.NOTSET:
+            return
+        records = self.records
+        if isinstance(records, _Spool):
+            un_checked = records.unchecked_rows(level)
+        else:
+            un_checked = []
+            for record, row in zip(records, self._actual_rows()):
+                if record.levelno >= level and not record.checked:  # type: ignore[attr-defined]
+                    un_checked.append(row)
+        dropped = self._dropped_unchecked_count(level)
+        if un_checked or dropped:
+            message = 'Not asserted ERROR log(s): %s' % pformat(un_checked)
+            if dropped:
+                message += '\n%i more were dropped as max_records was reached' % dropped
+            raise AssertionError(message)
+
+    def actual(self) -> list[Any]:
+        """
+        The sequence of actual records logged, having had their attributes
+        extracted as specified by the ``attributes`` parameter to the
+        :class:`LogCapture` constructor.
+
+        This can be useful for making more complex assertions about logged
+        records. The actual records logged can also be inspected by using the
+        :attr:`records` attribute.
+
+        Rows are only extracted from each record once, the first time they are
+        needed, and then re-used until :meth:`clear` is called.
+        """
+        return list(self._actual_rows())
+
+    def __str__(self) -> str:
+        if not self.records:
+            return 'No logging captured'
+        if self.structured:
+            lines = []
+            for row in self.actual():
+                fields = dict(row)
+                logger, level = fields.pop('logger'), fields.pop('level')
+                lines.append("%s %s\n  %s" % (logger, level, pformat(fields).replace('\n', '\n  ')))
+            return '\n'.join(lines)
+        return '\n'.join(["%s %s\n  %s" % r for r in self.actual()])
+
+    def check(self, *expected: Any) -> None:
+        """
+        This will compare the captured entries with the expected
+        entries provided and raise an :class:`AssertionError` if they
+        do not match.
+
+        :param expected:
+
+          A sequence of entries of the structure specified by the ``attributes``
+          passed to the constructor.
+        """
+        compare(
+            self._expected(expected),
+            actual=self.actual(),
+            recursive=self.recursive_check
+            )
+        self.mark_all_checked()
+
+    def check_present(self, *expected: Any, order_matters: bool = True) -> None:
+        """
+        This will check if the captured entries contain all of the expected
+        entries provided and raise an :class:`AssertionError` if not.
+        This will ignore entries that have been captured but that do not
+        match those in ``expected``.
+
+        :param expected:
+
+          A sequence of entries of the structure specified by the ``attributes``
+          passed to the constructor.
+
+        :param order_matters:
+
+          A keyword-only parameter that controls whether the order of the
+          captured entries is required to match those of the expected entries.
+          Defaults to ``True``.
+        """
+        actual = self.actual()
+        expected_ = SequenceComparison(
+            *self._expected(expected), ordered=order_matters, partial=True, recursive=self.recursive_check
+        )
+        if expected_ != actual:
+            raise AssertionError(expected_.failed)
+        for index in expected_.checked_indices:
+            self.records[index].checked = True
+
+
+class LogCaptureView(_CheckMethods):
+    """
+    A view of some of the records captured by a :class:`LogCapture`, as returned
+    by methods such as :meth:`LogCapture.query`.
+
+    The records in a view are those that had been captured when the view
+    was created. Checks made using a view only consider the records in that view,
+    but any records that are checked will also be marked as checked in the
+    :class:`LogCapture` from which the view was created.
+    """
+
+    def __init__(
+            self,
+            records: List[LogRecord],
+            rows: List[Any],
+            recursive_check: bool,
+            ensure_checks_above: int,
+            structured: bool = False,
+    ):
+        #: The records in this view.
+        self.records = records
+        self._rows = rows
+        self.recursive_check = recursive_check
+        self.ensure_checks_above = ensure_checks_above
+        self.structured = structured
+
+    def _actual_rows(self) -> List[Any]:
+        return self._rows
+
+
+class LogCapture(_CheckMethods, logging.Handler):
     """
     These are used to capture entries logged to the Python logging
     framework and make assertions about what was logged.
@@ -52,12 +495,89 @@ class LogCapture(logging.Handler):
       The log level above which checks must be made for logged events.
       See :meth:`ensure_checked`.
 
+    :param max_records:
+
+      If supplied, only this number of the most recently captured records will be kept,
+      with older records being dropped as new ones are captured. The number of
+      records dropped at each level is kept in :attr:`dropped` and
+      :meth:`ensure_checked` will still fail if unchecked records that it would
+      have complained about were dropped.
+
+    :param compact:
+
+      If ``True``, the row for each record will be extracted when it is captured,
+      using the ``attributes`` parameter, and only that row along with a few
+      attributes needed for checking will be kept in a :class:`CompactRecord`.
+      The original :class:`~logging.LogRecord`, along with any arguments, exception
+      information and stack frames it references, will not be kept.
+      This greatly reduces the memory used when capturing many records.
+
+    :param per_thread:
+
+      If ``True``, records will be captured into a buffer for each thread without
+      taking the handler's lock. The buffers are merged, in the order the records
+      were logged, whenever the captured records are used. This reduces contention
+      when many threads are logging. See :meth:`for_thread` for checking the records
+      logged by a particular thread.
+
+    :param per_task:
+
+      If ``True``, each record will have the :class:`asyncio.Task` that logged it,
+      or ``None`` if it was not logged from a task, stored in a ``task`` attribute
+      and a copy of the :mod:`contextvars` context in which it was logged stored
+      in a ``task_context`` attribute. See :meth:`for_task` and :meth:`for_context`
+      for checking the records logged by a particular task or in a particular context.
+
+    :param levels:
+
+      A mapping of logger name to the minimum level that should be captured from that
+      logger and its children. The levels of these loggers will be set when this
+      :class:`LogCapture` is installed and restored when it is uninstalled, so no
+      :class:`~logging.LogRecord` is even created for logging below these levels.
+      If ``ensure_checks_above`` is set, no level will be set higher than it, so that
+      :meth:`ensure_checked` still sees every record it would complain about.
+
+    :param spool:
+
+      If ``True``, the row for each record will be extracted when it is captured,
+      using the ``attributes`` parameter, and written to a temporary file along with
+      the attributes of the record needed to check it. Only the offset, level and
+      whether the record has been checked are kept in memory, with the records
+      being read back from the file as they are checked or used.
+      Rows must be picklable. This cannot be used with ``max_records``
+      or ``per_task``.
+
+    :param processes:
+
+      If ``True``, or a :mod:`multiprocessing` context, logging from child processes
+      can also be captured. Child processes must be started with :attr:`initializer`
+      and :attr:`initargs`, which can be passed to :class:`multiprocessing.pool.Pool`,
+      :class:`concurrent.futures.ProcessPoolExecutor` and the like. Records are then
+      sent back over a queue to a listener thread in this process while this
+      :class:`LogCapture` is installed. If a context is passed, it must be the one
+      used to start the child processes. Records from child processes have their
+      message, and any exception information, converted to text, unless the message
+      is a mapping that can be pickled, such as an event dictionary.
+
+    :param structured:
+
+      If ``True``, the row for each record will be the dictionary returned by
+      :func:`event_fields` and the ``attributes`` parameter is ignored.
+      Any dictionaries passed to :meth:`check` or :meth:`check_present` then only
+      need to match the fields they contain, rather than every field of the event.
+
+    :param index_fields:
+
+      When ``structured`` is used, the names of fields that will be indexed as records
+      are captured, so that :meth:`query` can find records with particular values for
+      those fields without examining every record.
+
     """
 
-    #: The records captured by this :class:`LogCapture`.
-    records: List[LogRecord]
     #: The log level above which checks must be made for logged events.
     ensure_checks_above: int
+    #: The number of records dropped, by level name, when ``max_records`` is used.
+    dropped: Counter[str]
 
     instances = set['LogCapture']()
     atexit_setup = False
@@ -74,7 +594,16 @@ class LogCapture(logging.Handler):
                     'name', 'levelname', 'getMessage'
             ),
             recursive_check: bool = False,
-            ensure_checks_above: int | None = None
+            ensure_checks_above: int | None = None,
+            max_records: int | None = None,
+            compact: bool = False,
+            per_thread: bool = False,
+            per_task: bool = False,
+            levels: Mapping[str, int] | None = None,
+            spool: bool = False,
+            processes: bool | BaseContext = False,
+            structured: bool = False,
+            index_fields: Sequence[str] = (),
     ):
         logging.Handler.__init__(self)
         if not isinstance(names, tuple):
@@ -84,6 +613,23 @@ class LogCapture(logging.Handler):
         self.propagate = propagate
         self.attributes = attributes
         self.recursive_check = recursive_check
+        self.max_records = max_records
+        self.compact = compact
+        self.per_thread = per_thread
+        self.per_task = per_task
+        self.levels = levels or {}
+        if spool and (max_records is not None or per_task):
+            raise TypeError('spool cannot be used with max_records or per_task')
+        self.spool = spool
+        self.structured = structured
+        if structured:
+            self.attributes = event_fields
+        self.index_fields = index_fields
+        self._context: Any = None
+        if processes:
+            self._context = multiprocessing.get_context() if processes is True else processes
+        self._queue: Any = None
+        self._listener: _ProcessListener | None = None
         self.old: dict[str, dict[str | None, Any]] = defaultdict(dict)
         if ensure_checks_above is None:
             self.ensure_checks_above = self.default_ensure_checks_above
@@ -106,59 +652,142 @@ class LogCapture(logging.Handler):
         # Some logging internals check boolean rather than identity for handlers :-(r
         return True
 
-    def __len__(self) -> int:
-        return len(self.records)
+    @property
+    def records(self) -> List[LogRecord] | Deque[LogRecord]:
+        """
+        The records captured by this :class:`LogCapture`.
+        """
+        if self._buffers:
+            self._merge_buffers()
+        return self._records
 
-    def __getitem__(self, index: int) -> Any:
-        return self._actual_row(self.records[index])
-
-    def __contains__(self, what: Any) -> bool:
-        item: Any
-        for i, item in enumerate(self):  # type: ignore[arg-type]
-            if what == item:
-                self.records[i].checked = True
-                return True
-        return False
+    @records.setter
+    def records(self, records: List[LogRecord] | Deque[LogRecord]) -> None:
+        self._records = records
 
     def clear(self) -> None:
         """Clear any entries that have been captured."""
-        self.records = []
-
-    def mark_all_checked(self) -> None:
-        """
-        Mark all captured events as checked.
-        This should be called if you have made assertions about logging
-        other than through :class:`LogCapture` methods.
-        """
-        for record in self.records:
-            record.checked = True
+        self._buffers: List[List[tuple[int, LogRecord]]] = []
+        self._local = threading.local()
+        self._sequence_numbers = count()
+        self._rows: List[Any] | Deque[Any]
+        self._close_spool()
+        if self.spool:
+            self.records = _Spool(self._actual_row)  # type: ignore[assignment]
+            self._rows = []
+        elif self.max_records is None:
+            self.records = []
+            self._rows = []
+        else:
+            self.records = deque(maxlen=self.max_records)
+            self._rows = deque()
+        self._rows_for = self.records
+        self._last_row_record: LogRecord | None = None
+        self.dropped = Counter()
+        self._dropped_unchecked = Counter[int]()
+        # Indexes of (sequence number, record) by logger name and level:
+        self._indexed = self.records
+        self._sequence = 0
+        self._by_name: dict[str, Deque[tuple[int, LogRecord]]] = defaultdict(deque)
+        self._by_level: dict[int, Deque[tuple[int, LogRecord]]] = defaultdict(deque)
+        self._by_task: dict[asyncio.Task[Any] | None, Deque[tuple[int, LogRecord]]] = (
+            defaultdict(deque)
+        )
+        self._by_field: dict[tuple[str, Any], Deque[tuple[int, LogRecord]]] = (
+            defaultdict(deque)
+        )
 
-    def ensure_checked(self, level: int | None = None) -> None:
-        """
-        Ensure every entry logged above the specified `level` has been checked.
-        Raises an :class:`AssertionError` if this is not the case.
-
-        :param level: the logging level, defaults to :attr:`ensure_checks_above`.
-        """
-        if level is None:
-            level = self.ensure_checks_above
-        if level == logging.NOTSET:
-            return
-        un_checked = []
-        for record in self.records:
-            if record.levelno >= level and not record.checked:  # type: ignore[attr-defined]
-                un_checked.append(self._actual_row(record))
-        if un_checked:
-            raise AssertionError((
-                    'Not asserted ERROR log(s): %s'
-                ) % (pformat(un_checked)))
+    def handle(self, record: logging.LogRecord) -> Any:
+        if not self.per_thread:
+            return super().handle(record)
+        # Records go to a buffer for the current thread, so the lock isn't needed.
+        # As with logging.Handler.handle(), a filter may return a record to use instead:
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        if rv:
+            self.emit(record)
+        return rv
 
     def emit(self, record: logging.LogRecord) -> None:
         """
         Record the :class:`~logging.LogRecord`.
         """
+        if self.per_task:
+            try:
+                record.task = asyncio.current_task()
+            except RuntimeError:
+                # no running event loop
+                record.task = None
+            record.task_context = copy_context()
+        if self.compact:
+            record = CompactRecord(record, self._actual_row(record))  # type: ignore[assignment]
         record.checked = False
-        self.records.append(record)
+        if self.per_thread:
+            try:
+                buffer = self._local.buffer
+            except AttributeError:
+                buffer = self._local.buffer = []
+                with self.lock:  # type: ignore[union-attr]
+                    self._buffers.append(buffer)
+            buffer.append((next(self._sequence_numbers), record))
+        else:
+            self._store(record)
+
+    def _merge_buffers(self) -> None:
+        with self.lock:  # type: ignore[union-attr]
+            taken = []
+            for buffer in self._buffers:
+                records = buffer[:]
+                del buffer[:len(records)]
+                taken.append(records)
+            for _, record in merge(*taken):
+                self._store(record)
+
+    def _store(self, record: logging.LogRecord) -> None:
+        records = self._records
+        if len(records) == self.max_records:
+            if records:
+                dropped = records[0]
+                if self._rows and self._rows_for is records:
+                    self._rows.popleft()  # type: ignore[union-attr]
+            else:
+                dropped = record
+            self.dropped[dropped.levelname] += 1
+            if not dropped.checked:  # type: ignore[attr-defined]
+                self._dropped_unchecked[dropped.levelno] += 1
+            for index in (
+                    self._by_name.get(dropped.name),
+                    self._by_level.get(dropped.levelno),
+                    self._by_task.get(getattr(dropped, 'task', None)),
+                    *self._field_indexes(dropped, create=False),
+            ):
+                if index and index[0][1] is dropped:
+                    index.popleft()
+        records.append(record)
+        if self.max_records != 0 and not self.spool:
+            entry = self._sequence, record
+            self._by_name[record.name].append(entry)
+            self._by_level[record.levelno].append(entry)
+            if self.per_task:
+                self._by_task[record.task].append(entry)  # type: ignore[attr-defined]
+            for index in self._field_indexes(record, create=True):
+                index.append(entry)  # type: ignore[union-attr]
+            self._sequence += 1
+
+    def _field_indexes(
+            self, record: LogRecord, create: bool
+    ) -> List[Deque[tuple[int, LogRecord]] | None]:
+        indexes = []
+        if self.structured:
+            for field in self.index_fields:
+                key = field, _event_field(record, field)
+                try:
+                    indexes.append(self._by_field[key] if create else self._by_field.get(key))
+                except TypeError:
+                    # unhashable value
+                    pass
+        return indexes
 
     def install(self) -> Self | None:
         """
@@ -182,6 +811,14 @@ class LogCapture(logging.Handler):
             logger.disabled = False
             if self.propagate is not None:
                 logger.propagate = self.propagate
+        for logger_name, level in self._prefilter_levels().items():
+            logger = logging.getLogger(logger_name)
+            self.old['prefilter_levels'][logger_name] = logger.level
+            logger.setLevel(level)
+        if self._context is not None and self._listener is None:
+            self._queue = self._context.Queue()
+            self._listener = _ProcessListener(self._queue, self)
+            self._listener.start()
         self.instances.add(self)
         if not self.__class__.atexit_setup:
             atexit.register(self.atexit)
@@ -197,7 +834,16 @@ class LogCapture(logging.Handler):
         that were removed during installation and restore their level
         that prior to installation.
         """
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+            self._queue.close()
+            self._queue.join_thread()
+            self._queue = None
         if self in self.instances:
+            for logger_name in reversed(list(self.levels)):
+                logger = logging.getLogger(logger_name)
+                logger.setLevel(self.old['prefilter_levels'][logger_name])
             for name in self.names:
                 logger = logging.getLogger(name)
                 logger.setLevel(self.old['levels'][name])
@@ -207,6 +853,43 @@ class LogCapture(logging.Handler):
                 logger.propagate = self.old['propagate'][name]
             self.instances.remove(self)
 
+    def _prefilter_levels(self) -> dict[str, int]:
+        levels = dict(self.levels)
+        if self.ensure_checks_above != logging.NOTSET:
+            for name, level in levels.items():
+                levels[name] = min(level, self.ensure_checks_above)
+        return levels
+
+    @property
+    def initializer(self) -> Callable[..., None]:
+        """
+        The function that must be used to initialise child processes when
+        ``processes`` is used, along with :attr:`initargs`.
+        """
+        if self._context is None:
+            raise TypeError('initializer requires processes to be used')
+        return _process_initializer
+
+    @property
+    def initargs(self) -> tuple[Any, ...]:
+        """
+        The arguments that must be passed to :attr:`initializer`.
+        These are only available while this :class:`LogCapture` is installed.
+        """
+        if self._context is None:
+            raise TypeError('initargs requires processes to be used')
+        if self._queue is None:
+            raise TypeError('initargs requires this LogCapture to be installed')
+        return self._queue, self.names, self.level, self._prefilter_levels()
+
+    def flush(self) -> None:
+        """
+        When ``processes`` is used, ensure that all records sent by child processes
+        so far have been captured.
+        """
+        if self._listener is not None:
+            self._listener.flush()
+
     @classmethod
     def uninstall_all(cls) -> None:
         "This will uninstall all existing :class:`LogCapture` objects."
@@ -217,6 +900,8 @@ class LogCapture(logging.Handler):
         # Convert a log record to a Tuple or attribute value according the attributes member.
         # record: logging.LogRecord
 
+        if isinstance(record, (CompactRecord, _SpooledRecord)):
+            return record.row
         if callable(self.attributes):
             return self.attributes(record)
         else:
@@ -231,70 +916,280 @@ class LogCapture(logging.Handler):
             else:
                 return tuple(values)
 
-    def actual(self) -> list[Any]:
+    def _dropped_unchecked_count(self, level: int) -> int:
+        return sum(count for levelno, count in self._dropped_unchecked.items()
+                   if levelno >= level)
+
+    def _actual_rows(self) -> List[Any] | Deque[Any]:
+        # Rows are cached once extracted, so only rows for records captured since
+        # the last call need to be extracted.
+        records = self.records
+        if isinstance(records, _Spool):
+            return _SpooledRows(records)  # type: ignore[return-value]
+        rows = self._rows
+        if self._rows_for is not records or len(rows) > len(records) or (
+                rows and records[len(rows)-1] is not self._last_row_record
+        ):
+            # records has been replaced or modified:
+            rows = self._rows = [] if isinstance(records, list) else deque()
+            self._rows_for = records
+        new = len(records) - len(rows)
+        if new:
+            if isinstance(records, list):
+                to_extract = records[len(rows):]
+            else:
+                to_extract = list(islice(reversed(records), new))
+                to_extract.reverse()
+            rows.extend(self._actual_row(record) for record in to_extract)
+            self._last_row_record = to_extract[-1]
+        return rows
+
+    def _indexes_usable(self) -> bool:
+        records = self.records
+        if not (
+            self._indexed is records and
+            sum(len(index) for index in self._by_level.values()) == len(records)
+        ):
+            return False
+        if not records:
+            return True
+        # The records may have been edited so that the last one has a level
+        # that was never indexed:
+        index = self._by_level.get(records[-1].levelno)
+        return index is not None and bool(index) and index[-1][1] is records[-1]
+
+    def query(
+            self,
+            name: str | None = None,
+            level: int | None = None,
+            since: float | None = None,
+            until: float | None = None,
+            fields: Mapping[str, Any] | None = None,
+    ) -> LogCaptureView:
         """
-        The sequence of actual records logged, having had their attributes
-        extracted as specified by the ``attributes`` parameter to the
-        :class:`LogCapture` constructor.
+        Return a :class:`LogCaptureView` of the records captured so far that
+        match all of the criteria supplied.
 
-        This can be useful for making more complex assertions about logged
-        records. The actual records logged can also be inspected by using the
-        :attr:`records` attribute.
+        :param name: Only include records logged to the logger with this name or
+                     any of its children.
+
+        :param level: Only include records logged at this level or above.
+
+        :param since: Only include records created at or after this time,
+                      as returned by :func:`time.time`.
+
+        :param until: Only include records created before this time,
+                      as returned by :func:`time.time`.
+
+        :param fields: When ``structured`` is used, only include records where the
+                       event has these values for these fields.
         """
-        actual = []
-        for r in self.records:
-            actual.append(self._actual_row(r))
-        return actual
+        records = self.records
+        rows = list(self._actual_rows())
+        selected: Iterable[tuple[int, LogRecord]]
+        if fields and not self.structured:
+            raise TypeError('fields can only be queried when structured=True')
+        fields = fields or {}
+        indexed = [field for field in fields if field in self.index_fields]
+        if self._indexes_usable() and self.structured and indexed:
+            offset = self._sequence - len(records)
+            try:
+                selected = self._by_field.get((indexed[0], fields[indexed[0]]), ())
+            except TypeError:
+                # unhashable value
+                selected = enumerate(records, offset)
+            if name is not None:
+                prefix = name + '.'
+                selected = ((i, r) for (i, r) in selected
+                            if r.name == name or r.name.startswith(prefix))
+            if level is not None:
+                selected = ((i, r) for (i, r) in selected if r.levelno >= level)
+        elif self._indexes_usable():
+            offset = self._sequence - len(records)
+            if name is not None:
+                prefix = name + '.'
+                selected = merge(*(
+                    index for logger_name, index in self._by_name.items()
+                    if logger_name == name or logger_name.startswith(prefix)
+                ))
+                if level is not None:
+                    selected = ((i, r) for (i, r) in selected if r.levelno >= level)
+            elif level is not None:
+                selected = merge(*(
+                    index for levelno, index in self._by_level.items() if levelno >= level
+                ))
+            else:
+                selected = enumerate(records, offset)
+        else:
+            offset = 0
+            prefix = '' if name is None else name + '.'
+            selected = (
+                (i, r) for (i, r) in enumerate(records)
+                if (name is None or r.name == name or r.name.startswith(prefix)) and
+                   (level is None or r.levelno >= level)
+            )
+        if since is not None:
+            selected = ((i, r) for (i, r) in selected if r.created >= since)
+        if until is not None:
+            selected = ((i, r) for (i, r) in selected if r.created < until)
+        if fields:
+            selected = (
+                (i, r) for (i, r) in selected
+                if all(rows[i - offset].get(field, _missing) == value
+                       for field, value in fields.items())
+            )
+        return self._view(selected, rows, offset)
 
-    def __str__(self) -> str:
-        if not self.records:
-            return 'No logging captured'
-        return '\n'.join(["%s %s\n  %s" % r for r in self.actual()])
+    def _view(
+            self, selected: Iterable[tuple[int, LogRecord]], rows: List[Any], offset: int
+    ) -> LogCaptureView:
+        view_records = []
+        view_rows = []
+        for i, record in selected:
+            view_records.append(record)
+            view_rows.append(rows[i - offset])
+        return self._make_view(view_records, view_rows)
 
-    def check(self, *expected: Any) -> None:
+    def _make_view(self, records: List[LogRecord], rows: List[Any]) -> LogCaptureView:
+        return LogCaptureView(
+            records, rows, self.recursive_check, self.ensure_checks_above, self.structured
+        )
+
+    def checkpoint(self) -> int:
         """
-        This will compare the captured entries with the expected
-        entries provided and raise an :class:`AssertionError` if they
-        do not match.
+        Return a cursor that can be passed to :meth:`since`, :meth:`check_since` or
+        :meth:`check_present_since` in order to only consider records captured
+        after this point. Cursors are no longer valid once :meth:`clear` has been called.
+        """
+        return len(self.records) + sum(self.dropped.values())
+
+    def since(self, cursor: int) -> LogCaptureView:
+        """
+        Return a :class:`LogCaptureView` of the records captured since the supplied
+        cursor was returned by :meth:`checkpoint`.
+        Only rows for these records are extracted, so the cost of this is
+        proportional to the number of records captured since the checkpoint.
+        """
+        records = self.records
+        rows = self._actual_rows()
+        start = max(cursor - sum(self.dropped.values()), 0)
+        new = max(len(records) - start, 0)
+        view_records: List[LogRecord]
+        view_rows: List[Any]
+        if isinstance(records, deque):
+            view_records = list(islice(reversed(records), new))
+            view_records.reverse()
+            view_rows = list(islice(reversed(rows), new))
+            view_rows.reverse()
+        else:
+            view_records = [records[i] for i in range(start, start + new)]
+            view_rows = [rows[i] for i in range(start, start + new)]
+        return self._make_view(view_records, view_rows)
+
+    def check_since(self, cursor: int, *expected: Any) -> None:
+        """
+        This will compare the entries captured since the supplied cursor was returned
+        by :meth:`checkpoint` with the expected entries provided and raise an
+        :class:`AssertionError` if they do not match.
+
+        :param cursor: A cursor returned by :meth:`checkpoint`.
 
         :param expected:
 
           A sequence of entries of the structure specified by the ``attributes``
           passed to the constructor.
         """
-        compare(
-            expected,
-            actual=self.actual(),
-            recursive=self.recursive_check
-            )
-        self.mark_all_checked()
+        self.since(cursor).check(*expected)
 
-    def check_present(self, *expected: Any, order_matters: bool = True) -> None:
+    def check_present_since(
+            self, cursor: int, *expected: Any, order_matters: bool = True
+    ) -> None:
         """
-        This will check if the captured entries contain all of the expected
-        entries provided and raise an :class:`AssertionError` if not.
-        This will ignore entries that have been captured but that do not
-        match those in ``expected``.
+        This will check if the entries captured since the supplied cursor was returned
+        by :meth:`checkpoint` contain all the expected entries provided and raise an
+        :class:`AssertionError` if not.
 
-        :param expected:
+        :param cursor: A cursor returned by :meth:`checkpoint`.
 
-          A sequence of entries of the structure specified by the ``attributes``
-          passed to the constructor.
+        See :meth:`check_present` for the other parameters.
+        """
+        self.since(cursor).check_present(*expected, order_matters=order_matters)
 
-        :param order_matters:
+    def for_task(self, task: asyncio.Task[Any] | None = None) -> LogCaptureView:
+        """
+        Return a :class:`LogCaptureView` of the records captured so far that
+        were logged by the specified :class:`asyncio.Task`.
+        This requires ``per_task=True`` to have been passed to the constructor.
 
-          A keyword-only parameter that controls whether the order of the
-          captured entries is required to match those of the expected entries.
-          Defaults to ``True``.
+        :param task: The task. If not specified, the current task is used or,
+                     if there is no current task, records not logged by any task.
         """
-        actual = self.actual()
-        expected_ = SequenceComparison(
-            *expected, ordered=order_matters, partial=True, recursive=self.recursive_check
+        if not self.per_task:
+            raise TypeError('for_task() requires per_task=True')
+        if task is None:
+            try:
+                task = asyncio.current_task()
+            except RuntimeError:
+                # no running event loop
+                pass
+        records = self.records
+        rows = list(self._actual_rows())
+        if self._indexes_usable():
+            return self._view(self._by_task.get(task, ()), rows, self._sequence - len(records))
+        return self._view(
+            ((i, r) for (i, r) in enumerate(records) if getattr(r, 'task', None) is task),
+            rows, 0
         )
-        if expected_ != actual:
-            raise AssertionError(expected_.failed)
-        for index in expected_.checked_indices:
-            self.records[index].checked = True
+
+    def for_context(self, var: ContextVar[Any], value: Any) -> LogCaptureView:
+        """
+        Return a :class:`LogCaptureView` of the records captured so far that
+        were logged when the supplied :class:`~contextvars.ContextVar` was set
+        to the supplied value.
+        This requires ``per_task=True`` to have been passed to the constructor.
+
+        :param var: The context variable.
+
+        :param value: The value the context variable must have been set to.
+        """
+        if not self.per_task:
+            raise TypeError('for_context() requires per_task=True')
+        unset = object()
+        view_records = []
+        view_rows = []
+        for record, row in zip(self.records, self._actual_rows()):
+            context = getattr(record, 'task_context', None)
+            if context is not None and context.get(var, unset) == value:
+                view_records.append(record)
+                view_rows.append(row)
+        return self._make_view(view_records, view_rows)
+
+    def for_thread(self, thread: threading.Thread | int | None = None) -> LogCaptureView:
+        """
+        Return a :class:`LogCaptureView` of the records captured so far that
+        were logged by the specified thread, in the order that thread logged them.
+
+        :param thread: The :class:`~threading.Thread` or thread identifier.
+                       If not specified, the current thread is used.
+
+        .. note:: Thread identifiers may be re-used once a thread has finished,
+                  so records from an earlier thread may also be included.
+        """
+        if thread is None:
+            ident = threading.get_ident()
+        elif isinstance(thread, threading.Thread):
+            if thread.ident is None:
+                raise ValueError(f'{thread!r} has not been started')
+            ident = thread.ident
+        else:
+            ident = thread
+        view_records = []
+        view_rows = []
+        for record, row in zip(self.records, self._actual_rows()):
+            if record.thread == ident:
+                view_records.append(record)
+                view_rows.append(row)
+        return self._make_view(view_records, view_rows)
 
     def __enter__(self) -> Self:
         return self
@@ -308,6 +1203,11 @@ class LogCapture(logging.Handler):
         self.uninstall()
         self.ensure_checked()
 
+    def _close_spool(self) -> None:
+        records = getattr(self, '_records', None)
+        if isinstance(records, _Spool):
+            records.close()
+
     def close(self) -> None:
         super().close()
         if self in self.instances:
@@ -316,6 +1216,7 @@ class LogCapture(logging.Handler):
                 'loggers captured:\n'
                 '%s' % ('\n'.join((str(i.names) for i in self.instances)))
             )
+        self._close_spool()
 
 
 class LogCaptureForDecorator(LogCapture):
@@ -1,12 +1,278 @@
 import os
+import selectors
 import sys
-from io import StringIO
+from codecs import getincrementaldecoder
+from contextlib import nullcontext
+from contextvars import ContextVar, Token
+from io import SEEK_END, StringIO, TextIOBase
+from itertools import zip_longest
 from tempfile import TemporaryFile
-from typing import Self, Any, IO
+from threading import Lock, Thread
+from typing import Self, Any, IO, Literal, Sequence, Iterator, Iterable, ContextManager
 
+from testfixtures import not_there
 from testfixtures.comparison import compare
 
 
+def _read_lines(
+        stream: IO, start: int, end: int, lock: ContextManager[Any]
+) -> Iterator[str]:
+    # Lazily yield the lines between two positions in a stream without their line endings.
+    # The stream's position is put back at its end after each read, as writes to the
+    # stream, or to file descriptors sharing its position, may happen between reads.
+    decoder = getincrementaldecoder('utf-8')('replace')
+    position = start
+    pending = ''
+    while position < end:
+        with lock:
+            stream.seek(position)
+            data = stream.read(min(65536, end - position))
+            stream.seek(0, SEEK_END)
+        if not data:
+            break
+        position += len(data)
+        if isinstance(data, bytes):
+            data = decoder.decode(data, final=position >= end)
+        *lines, pending = (pending + data).split('\n')
+        yield from lines
+    if pending:
+        yield pending
+
+
+def _strip_lines(lines: Iterable[tuple[int, Any]]) -> Iterator[tuple[int, Any]]:
+    # The equivalent of stripping leading and trailing whitespace from the text that
+    # the numbered lines make up, while only holding blank lines in memory. Items that
+    # aren't strings, such as comparison objects, are treated as non-blank.
+    lines = iter(lines)
+    for number, line in lines:
+        if not isinstance(line, str):
+            previous = number, line
+            break
+        if line.strip():
+            previous = number, line.lstrip()
+            break
+    else:
+        return
+    blank = []
+    for number, line in lines:
+        if isinstance(line, str) and not line.strip():
+            blank.append((number, line))
+        else:
+            yield previous
+            yield from blank
+            blank = []
+            previous = number, line
+    number, line = previous
+    yield number, line.rstrip() if isinstance(line, str) else line
+
+
+class _Buffer(TextIOBase):
+    # An in-memory stream that can be read incrementally and whose size can be limited
+    # by either spilling to a temporary file or only keeping the most recent output.
+
+    def __init__(self, max_size: int | None, overflow: Literal['spill', 'truncate']) -> None:
+        self.max_size = max_size
+        self.overflow = overflow
+        self._memory: StringIO | None = StringIO()
+        self._file: IO[bytes] | None = None
+        # The position up to which read_new() has read, in characters for
+        # the in-memory buffer or bytes for the file:
+        self._read_position = 0
+        self._decoder = getincrementaldecoder('utf-8')()
+        self._lock = Lock()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            return self._write(text)
+
+    def _write(self, text: str) -> int:
+        memory = self._memory
+        if memory is None:
+            self._file.write(text.encode())  # type: ignore[union-attr]
+            return len(text)
+        memory.write(text)
+        max_size = self.max_size
+        if max_size is not None:
+            size = memory.tell()
+            if self.overflow == 'spill':
+                if size > max_size:
+                    self._spill(memory)
+            # Only discard once double the maximum size is reached,
+            # so the cost of discarding is spread over many writes:
+            elif size > 2 * max_size:
+                kept = memory.getvalue()[-max_size:]
+                self._read_position = max(self._read_position - (size - max_size), 0)
+                self._memory = StringIO()
+                self._memory.write(kept)
+        return len(text)
+
+    def _spill(self, memory: StringIO) -> None:
+        value = memory.getvalue()
+        self._file = TemporaryFile()
+        self._file.write(value.encode())
+        self._read_position = len(value[:self._read_position].encode())
+        self._memory = None
+
+    def getvalue(self) -> str:
+        with self._lock:
+            return self._getvalue()
+
+    def _getvalue(self) -> str:
+        if self._memory is None:
+            self._file.seek(0)  # type: ignore[union-attr]
+            return self._file.read().decode()  # type: ignore[union-attr]
+        value = self._memory.getvalue()
+        if self.max_size is not None and self.overflow == 'truncate':
+            value = value[-self.max_size:]
+        return value
+
+    def read_new(self) -> str:
+        with self._lock:
+            return self._read_new()
+
+    def _read_new(self) -> str:
+        memory = self._memory
+        if memory is None:
+            file = self._file
+            file.seek(self._read_position)  # type: ignore[union-attr]
+            data = file.read()  # type: ignore[union-attr]
+            self._read_position += len(data)
+            return self._decoder.decode(data)
+        size = memory.tell()
+        start = self._read_position
+        if self.max_size is not None and self.overflow == 'truncate':
+            start = max(start, size - self.max_size)
+        memory.seek(start)
+        text = memory.read()
+        self._read_position = size
+        return text
+
+    def lines(self) -> Iterator[str]:
+        # The lines written so far. The stream being read is kept hold of, so the
+        # lines will be consistent even if output is spilled or truncated while
+        # they are being iterated over.
+        with self._lock:
+            stream: IO | None = self._memory
+            start = 0
+            if stream is None:
+                stream = self._file
+                end = stream.seek(0, SEEK_END)  # type: ignore[union-attr]
+            else:
+                end = stream.tell()
+                if self.max_size is not None and self.overflow == 'truncate':
+                    start = max(end - self.max_size, 0)
+        return _read_lines(stream, start, end, self._lock)  # type: ignore[arg-type]
+
+
+class _PipeReader(Thread):
+    # Drains pipes into buffers so that writers to the pipes never block.
+
+    def __init__(self, buffers: Sequence[_Buffer]) -> None:
+        super().__init__(daemon=True)
+        self.lock = Lock()
+        self.pipes = {}
+        self.write_fds = []
+        for buffer in buffers:
+            read_fd, write_fd = os.pipe()
+            os.set_blocking(read_fd, False)
+            self.pipes[read_fd] = buffer, getincrementaldecoder('utf-8')('replace')
+            self.write_fds.append(write_fd)
+        self.wakeup_read, self.wakeup_write = os.pipe()
+
+    def run(self) -> None:
+        with selectors.DefaultSelector() as selector:
+            for fd in self.pipes:
+                selector.register(fd, selectors.EVENT_READ)
+            selector.register(self.wakeup_read, selectors.EVENT_READ)
+            while True:
+                for key, _ in selector.select():
+                    if key.fd == self.wakeup_read:
+                        return
+                    if not self.drain(key.fd):
+                        selector.unregister(key.fd)
+
+    def drain(self, fd: int) -> bool:
+        # Returns False once the write end of the pipe has been closed.
+        buffer, decoder = self.pipes[fd]
+        with self.lock:
+            while True:
+                try:
+                    data = os.read(fd, 65536)
+                except BlockingIOError:
+                    return True
+                buffer.write(decoder.decode(data, final=not data))
+                if not data:
+                    return False
+
+    def drain_all(self) -> None:
+        for fd in self.pipes:
+            self.drain(fd)
+
+    def stop(self) -> None:
+        self.drain_all()
+        os.write(self.wakeup_write, b'x')
+        self.join()
+        for fd in (*self.pipes, self.wakeup_read, self.wakeup_write):
+            os.close(fd)
+
+
+# The OutputCapture using per_context that is enabled in the current context:
+_context_capture: ContextVar['OutputCapture | None'] = ContextVar(
+    'testfixtures.outputcapture', default=None
+)
+_context_streams_lock = Lock()
+_context_streams_users = 0
+
+
+class _ContextStream:
+    # Installed as sys.stdout and sys.stderr while any OutputCapture using per_context
+    # is enabled, sending output to the capture enabled in the context it was written
+    # from or, where there isn't one, to the stream that was replaced.
+
+    def __init__(self, name: str, original: IO[str]) -> None:
+        self.name = name
+        self.original = original
+
+    def _target(self) -> IO[str] | _Buffer:
+        capture = _context_capture.get()
+        if capture is None or capture._targets is None:
+            return self.original
+        return capture._targets[self.name]
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.original, name)
+
+
+def _install_context_streams() -> None:
+    global _context_streams_users
+    with _context_streams_lock:
+        if not _context_streams_users:
+            sys.stdout = _ContextStream('stdout', sys.stdout)  # type: ignore[assignment]
+            sys.stderr = _ContextStream('stderr', sys.stderr)  # type: ignore[assignment]
+        _context_streams_users += 1
+
+
+def _uninstall_context_streams() -> None:
+    global _context_streams_users
+    with _context_streams_lock:
+        _context_streams_users -= 1
+        if not _context_streams_users:
+            for name in 'stdout', 'stderr':
+                stream = getattr(sys, name)
+                # Leave alone anything that has since replaced the stream:
+                if isinstance(stream, _ContextStream):
+                    setattr(sys, name, stream.original)
+
+
 class OutputCapture:
     """
     A context manager for capturing output to the
@@ -26,31 +292,92 @@ class OutputCapture:
         When ``True``, which is the default, leading and training whitespace
         is trimmed from both the expected and actual values when comparing.
 
+    :param max_size:
+        If supplied, the maximum number of characters of output that will be kept
+        in memory for each stream. What happens when this is exceeded is controlled by
+        ``overflow``. This cannot be used when ``fd`` is ``True``, unless ``pipe``
+        is also ``True``, as output is then always captured to temporary files.
+
+    :param overflow:
+        If ``'spill'``, which is the default, output will be moved to a temporary file
+        once ``max_size`` is exceeded, with all further output being written there.
+        If ``'truncate'``, only the most recent ``max_size`` characters of output will
+        be kept.
+
+    :param pipe:
+        If ``True``, when ``fd`` is ``True``, the file descriptors will be captured using
+        pipes rather than temporary files. A background thread reads from the pipes as
+        output is written, so that writers are never blocked, and keeps the output in
+        memory, where ``max_size`` can be used to limit how much is kept.
+        When ``separate`` is not used, ``stdout`` and ``stderr`` share a single pipe so
+        that the order in which output was written to them is preserved.
+        Output written once the capture has been disabled is not captured.
+        This is not available on Windows.
+
+    :param per_context:
+        If ``True``, only output written in the :mod:`contextvars` context in which the
+        capture was enabled will be captured. This means that concurrent asyncio tasks
+        or threads can each capture their own output. Tasks created while the capture
+        is enabled inherit the context and so will have their output captured, but
+        threads do not. Output written in other contexts is passed to the streams that
+        were in place when the first such capture was enabled. The capture must be
+        disabled in the same context it was enabled in, otherwise a :class:`ValueError`
+        is raised. This cannot be used with ``fd``.
+
     .. note:: If ``separate`` is passed as ``True``,
               :attr:`OutputCapture.captured` will be an empty string.
     """
 
-    output: IO
-    stdout: IO
-    stderr: IO
+    output: IO | _Buffer
+    stdout: IO | _Buffer
+    stderr: IO | _Buffer
+    _read_positions: dict[str, tuple[int, Any]]
 
     original_stdout: IO[str] | int | None = None
     original_stderr: IO[str] | int | None = None
 
-    def __init__(self, separate: bool = False, fd: bool = False, strip_whitespace: bool = True):
+    def __init__(
+            self,
+            separate: bool = False,
+            fd: bool = False,
+            strip_whitespace: bool = True,
+            max_size: int | None = None,
+            overflow: Literal['spill', 'truncate'] = 'spill',
+            pipe: bool = False,
+            per_context: bool = False,
+    ):
+        if per_context and fd:
+            raise TypeError('per_context cannot be used with fd=True')
+        if pipe and not fd:
+            raise TypeError('pipe can only be used with fd=True')
+        if fd and not pipe and max_size is not None:
+            raise TypeError('max_size cannot be used with fd=True unless pipe=True')
         self.separate = separate
+        self.pipe = pipe
+        self._reader: _PipeReader | None = None
+        self.per_context = per_context
+        self._targets: dict[str, IO | _Buffer] | None = None
+        self._token: Token[OutputCapture | None] | None = None
         self.fd = fd
         self.strip_whitespace = strip_whitespace
+        self.max_size = max_size
+        self.overflow = overflow
 
     def __enter__(self) -> Self:
-        if self.fd:
+        if self.fd and not self.pipe:
             self.output = TemporaryFile()
             self.stdout = TemporaryFile()
             self.stderr = TemporaryFile()
+            self._read_positions = {}
+        elif self.max_size is not None or self.pipe or self.per_context:
+            self.output = _Buffer(self.max_size, self.overflow)
+            self.stdout = _Buffer(self.max_size, self.overflow)
+            self.stderr = _Buffer(self.max_size, self.overflow)
         else:
             self.output = StringIO()
             self.stdout = StringIO()
             self.stderr = StringIO()
+            self._read_positions = {}
         self.enable()
         return self
 
@@ -59,13 +386,26 @@ class OutputCapture:
 
     def disable(self) -> None:
         "Disable the output capture if it is enabled."
-        if self.fd:
+        if self.per_context:
+            if self._token is not None:
+                # This raises if disabled from a different context to the one
+                # this capture was enabled in, leaving it enabled:
+                _context_capture.reset(self._token)
+                self._token = None
+                self._targets = None
+                _uninstall_context_streams()
+        elif self.fd:
             for original, current in (
                 (self.original_stdout, sys.stdout),
                 (self.original_stderr, sys.stderr),
             ):
+                if self.pipe:
+                    current.flush()
                 os.dup2(original, current.fileno())  # type: ignore[arg-type]
                 os.close(original)  # type: ignore[arg-type]
+            if self._reader is not None:
+                self._reader.stop()
+                self._reader = None
 
         else:
             sys.stdout = self.original_stdout
@@ -73,6 +413,15 @@ class OutputCapture:
 
     def enable(self) -> None:
         "Enable the output capture if it is disabled."
+        if self.per_context:
+            if self._targets is None:
+                self._targets = {
+                    'stdout': self.stdout if self.separate else self.output,
+                    'stderr': self.stderr if self.separate else self.output,
+                }
+                self._token = _context_capture.set(self)
+                _install_context_streams()
+            return
         if self.original_stdout is None:
             if self.fd:
                 self.original_stdout = os.dup(sys.stdout.fileno())
@@ -80,7 +429,18 @@ class OutputCapture:
             else:
                 self.original_stdout = sys.stdout
                 self.original_stderr = sys.stderr
-        if self.separate:
+        if self.pipe:
+            if self._reader is None:
+                buffers = (self.stdout, self.stderr) if self.separate else (self.output,)
+                self._reader = _PipeReader(buffers)  # type: ignore[arg-type]
+                self._reader.start()
+                write_fds = self._reader.write_fds
+                for write_fd, current in zip(write_fds * 2, (sys.stdout, sys.stderr)):
+                    current.flush()
+                    os.dup2(write_fd, current.fileno())
+                for write_fd in write_fds:
+                    os.close(write_fd)
+        elif self.separate:
             if self.fd:
                 os.dup2(self.stdout.fileno(), sys.stdout.fileno())
                 os.dup2(self.stderr.fileno(), sys.stderr.fileno())
@@ -94,18 +454,56 @@ class OutputCapture:
             else:
                 sys.stdout = sys.stderr = self.output
 
-    def _read(self, stream: IO | StringIO) -> str:
-        if self.fd:
-            stream.seek(0)
-            return stream.read().decode()  # type: ignore[union-attr]
-        else:
-            return stream.getvalue()  # type: ignore[union-attr]
+    def _sync(self) -> None:
+        # Make sure any output written to the pipes so far is in the buffers:
+        if self._reader is not None:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            self._reader.drain_all()
+
+    def _read(self, stream: IO | _Buffer) -> str:
+        if isinstance(stream, _Buffer):
+            self._sync()
+            return stream.getvalue()
+        if isinstance(stream, StringIO):
+            return stream.getvalue()
+        stream.seek(0)
+        return stream.read().decode()
 
     @property
     def captured(self) -> str:
         "A property containing any output that has been captured so far."
         return self._read(self.output)
 
+    def read_new(self, stream: Literal['captured', 'stdout', 'stderr'] = 'captured') -> str:
+        """
+        Return the output that has been captured since the last call to this method
+        for the same stream. Only the new output is read, so this can be used to
+        check the output of long-running code as it progresses.
+
+        :param stream: ``'captured'``, the default, for the combined output,
+                       or ``'stdout'`` or ``'stderr'`` when ``separate`` is used.
+        """
+        source = self.output if stream == 'captured' else getattr(self, stream)
+        if isinstance(source, _Buffer):
+            self._sync()
+            return source.read_new()
+        if isinstance(source, StringIO):
+            end = source.seek(0, SEEK_END)
+            position, _ = self._read_positions.get(stream, (0, None))
+            # The output may have been truncated since the last read:
+            source.seek(min(position, end))
+            text = source.read()
+            self._read_positions[stream] = source.tell(), None
+            return text
+        position, decoder = self._read_positions.get(
+            stream, (0, getincrementaldecoder('utf-8')())
+        )
+        source.seek(position)
+        data = source.read()
+        self._read_positions[stream] = position + len(data), decoder
+        return decoder.decode(data)
+
     def compare(self, expected: str = '', stdout: str = '', stderr: str = '') -> None:
         """
         Compare the captured output to that expected. If the output is
@@ -135,3 +533,134 @@ class OutputCapture:
             compare(expected=tuple(expected_mapping.values())[0],
                     actual=tuple(actual_mapping.values())[0])
         compare(expected=expected_mapping, actual=actual_mapping)
+
+    def _lines(self, stream: IO | _Buffer) -> Iterator[str]:
+        if isinstance(stream, _Buffer):
+            self._sync()
+            return stream.lines()
+        end = stream.seek(0, SEEK_END)
+        return _read_lines(stream, 0, end, nullcontext())
+
+    def compare_lines(
+            self,
+            *expected: Any,
+            stream: Literal['captured', 'stdout', 'stderr'] = 'captured',
+            partial: bool = False,
+            ordered: bool = True,
+            max_mismatches: int = 3,
+    ) -> None:
+        """
+        Compare the captured output to the expected lines, one line at a time.
+        Lines are read from the captured output as they are needed, so this can be
+        used for output that is too large to compare using :meth:`compare`.
+        If the output is not as expected, an :class:`AssertionError` will be raised.
+
+        :param expected: The expected lines, without their line endings. These can
+                         be strings or objects such as :class:`StringComparison`
+                         that compare equal to the lines they match.
+
+        :param stream: ``'captured'``, the default, for the combined output,
+                       or ``'stdout'`` or ``'stderr'`` when ``separate`` is used.
+
+        :param partial: If ``True``, the captured output may contain lines other than
+                        those expected.
+
+        :param ordered: If ``False``, the expected lines may be found in any order.
+
+        :param max_mismatches: The number of mismatched lines after which to stop
+                               comparing and report the mismatches found.
+        """
+        source = self.output if stream == 'captured' else getattr(self, stream)
+        actual: Iterable[tuple[int, str]] = enumerate(self._lines(source), 1)
+        if self.strip_whitespace:
+            actual = _strip_lines(actual)
+            expected = tuple(e for _, e in _strip_lines(enumerate(expected)))
+        if ordered and not partial:
+            problems = self._mismatched_lines(expected, actual, max_mismatches)
+        else:
+            problems = self._missing_lines(expected, actual, partial, ordered, max_mismatches)
+        if problems:
+            raise AssertionError('\n'.join([f'{stream} lines not as expected:', *problems]))
+
+    @staticmethod
+    def _mismatched_lines(
+            expected: Sequence[Any], actual: Iterable[tuple[int, str]], max_mismatches: int
+    ) -> list[str]:
+        problems = []
+        number = 0
+        numbered: Any
+        a: Any
+        for e, numbered in zip_longest(expected, actual, fillvalue=not_there):
+            if numbered is not_there:
+                number, a = number + 1, not_there
+            else:
+                number, a = numbered
+            if not (e == a):
+                problems.append(f'line {number}: {e!r} (expected) != {a!r} (actual)')
+                if len(problems) >= max_mismatches:
+                    break
+        return problems
+
+    @staticmethod
+    def _missing_lines(
+            expected: Sequence[Any],
+            actual: Iterable[tuple[int, str]],
+            partial: bool,
+            ordered: bool,
+            max_mismatches: int,
+    ) -> list[str]:
+        missing: list[Any]
+        unexpected = []
+        if ordered:
+            # Other lines may be found between the expected lines:
+            index = 0
+            for _, line in actual:
+                if index == len(expected):
+                    break
+                if expected[index] == line:
+                    index += 1
+            missing = list(expected[index:])
+        else:
+            # Plain strings are looked up by hash, leaving only the other
+            # expected objects to be tried against each line in turn:
+            counts: dict[str, int] = {}
+            patterns = []
+            for e in expected:
+                if isinstance(e, str):
+                    counts[e] = counts.get(e, 0) + 1
+                else:
+                    patterns.append(e)
+            outstanding = len(expected)
+            stopped = False
+            for number, line in actual:
+                if partial and not outstanding:
+                    break
+                if counts.get(line):
+                    counts[line] -= 1
+                else:
+                    for i, pattern in enumerate(patterns):
+                        if pattern == line:
+                            del patterns[i]
+                            break
+                    else:
+                        if not partial:
+                            unexpected.append(f'line {number}: {line!r}')
+                            if len(unexpected) >= max_mismatches:
+                                stopped = True
+                                break
+                        continue
+                outstanding -= 1
+            if stopped:
+                # Not all lines have been read, so what's missing isn't yet known:
+                missing = []
+            else:
+                missing = [e for e, count in counts.items() for _ in range(count)]
+                missing.extend(patterns)
+        problems = []
+        if missing:
+            problems.append('expected but not found:')
+            problems.extend(repr(e) for e in missing[:max_mismatches])
+        if unexpected:
+            problems.append('unexpected lines:')
+            problems.extend(unexpected)
+        return problems
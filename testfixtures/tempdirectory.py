@@ -1,17 +1,263 @@
 import atexit
+import hashlib
+import mmap
 import os
 import warnings
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from re import compile
+from re import UNICODE, Pattern, compile
+from stat import S_ISDIR
 from tempfile import mkdtemp
 from types import TracebackType
-from typing import Sequence, Callable, TypeAlias, Self
+from typing import Any, Mapping, Sequence, Callable, TypeAlias, Self
 
+from testfixtures import not_there, singleton
 from testfixtures.comparison import compare
 from testfixtures.utils import wrap
 from .rmtree import rmtree
 
 PathStrings: TypeAlias = str | Sequence[str]
+_Ignored: TypeAlias = Callable[[str], object] | None
+#: The size, modification time in nanoseconds and inode of an entry in a :class:`Snapshot`.
+EntryStat: TypeAlias = tuple[int, int, int]
+_Found: TypeAlias = list[tuple[str, EntryStat | None]]
+_Scanned: TypeAlias = tuple[_Found, list[tuple[str, str]]]
+# Shown in place of the contents when a path expected to be a file is a directory:
+_directory = singleton('directory')
+
+
+def _entry_stat(entry: os.DirEntry[str]) -> EntryStat:
+    stat = entry.stat(follow_symlinks=False)
+    return stat.st_size, stat.st_mtime_ns, entry.inode()
+
+
+def _scan(
+        path: str,
+        prefix: str,
+        files_only: bool,
+        followlinks: bool,
+        ignored: _Ignored,
+        stat: bool,
+) -> _Scanned:
+    # Returns the relative paths found in a directory that aren't ignored, and their
+    # stats if requested, along with the subdirectories that should be walked.
+    # Ignored subdirectories are not walked.
+    found: _Found = []
+    subdirectories = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    relative = prefix + entry.name + '/'
+                    if ignored is not None and ignored(relative):
+                        continue
+                    if followlinks or not entry.is_symlink():
+                        subdirectories.append((entry.path, relative))
+                    if files_only:
+                        continue
+                else:
+                    relative = prefix + entry.name
+                    if ignored is not None and ignored(relative):
+                        continue
+                try:
+                    found.append((relative, _entry_stat(entry) if stat else None))
+                except OSError:
+                    # The entry was removed while the directory was being walked.
+                    pass
+    except OSError:
+        # Like os.walk, directories that can't be read are skipped.
+        pass
+    return found, subdirectories
+
+
+def _walk(
+        path: str,
+        files_only: bool,
+        followlinks: bool,
+        ignored: _Ignored,
+        workers: int | None,
+        stat: bool = False,
+) -> _Found:
+    result, subdirectories = _scan(path, '', files_only, followlinks, ignored, stat)
+    if workers is None:
+        while subdirectories:
+            found, more = _scan(*subdirectories.pop(), files_only, followlinks, ignored, stat)
+            result.extend(found)
+            subdirectories.extend(more)
+    else:
+        with ThreadPoolExecutor(workers) as pool:
+            pending: set[Future[_Scanned]] = set()
+            while subdirectories or pending:
+                for subdirectory in subdirectories:
+                    pending.add(pool.submit(
+                        _scan, *subdirectory, files_only, followlinks, ignored, stat
+                    ))
+                subdirectories = []
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    found, more = future.result()
+                    result.extend(found)
+                    subdirectories.extend(more)
+    return result
+
+
+class Snapshot:
+    """
+    A record of the contents of a :class:`TempDirectory`, as returned by
+    :meth:`TempDirectory.snapshot`.
+    """
+
+    def __init__(self, path: str, followlinks: bool, entries: dict[str, EntryStat]):
+        #: The absolute path of the directory that the snapshot was taken of.
+        self.path = path
+        #: Whether symlinks to directories were followed when taking the snapshot.
+        self.followlinks = followlinks
+        #: A mapping of the relative paths of the entries in the directory,
+        #: with directories ending in a forward slash, to their :data:`EntryStat`.
+        self.entries = entries
+
+    def __repr__(self) -> str:
+        return f'<Snapshot of {self.path}: {len(self.entries)} entries>'
+
+
+class Changes:
+    """
+    The changes to the contents of a :class:`TempDirectory`, as returned by
+    :meth:`TempDirectory.changes_since`. The changes expected can be checked by
+    using :func:`compare` with a :class:`Changes` made up of the expected paths.
+
+    :param added: The sorted relative paths of entries that have been added.
+
+    :param removed: The sorted relative paths of entries that have been removed.
+
+    :param modified: The sorted relative paths of files whose size, modification time
+                     or inode have changed.
+    """
+
+    def __init__(
+            self,
+            added: Sequence[str] = (),
+            removed: Sequence[str] = (),
+            modified: Sequence[str] = (),
+    ):
+        self.added = list(added)
+        self.removed = list(removed)
+        self.modified = list(modified)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Changes):
+            return NotImplemented
+        return vars(self) == vars(other)
+
+    def __repr__(self) -> str:
+        return f'<Changes added={self.added} removed={self.removed} modified={self.modified}>'
+
+
+# Files larger than this are memory mapped rather than read:
+_MMAP_SIZE = 1024 * 1024
+
+
+class FileHash:
+    """
+    The expected hash of the contents of a file, for use with
+    :meth:`TempDirectory.compare_contents`.
+
+    :param hexdigest: The expected hex digest of the file's contents.
+
+    :param algorithm: The name of the :mod:`hashlib` algorithm that produced the digest.
+
+    :param size: If supplied, the expected size of the file in bytes. This is checked
+                 before the file is read.
+    """
+
+    def __init__(self, hexdigest: str, algorithm: str = 'sha256', size: int | None = None):
+        self.hexdigest = hexdigest.lower()
+        self.algorithm = algorithm
+        self.size = size
+
+    @classmethod
+    def of(cls, data: bytes, algorithm: str = 'sha256', size: bool = False) -> 'FileHash':
+        """
+        Make a :class:`FileHash` for the supplied data.
+
+        :param size: If ``True``, the size of the data will also be included.
+        """
+        return cls(hashlib.new(algorithm, data).hexdigest(), algorithm, len(data) if size else None)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, FileHash):
+            return NotImplemented
+        return vars(self) == vars(other)
+
+    def __repr__(self) -> str:
+        size = '' if self.size is None else f', size={self.size}'
+        return f'<FileHash {self.algorithm}:{self.hexdigest}{size}>'
+
+
+def _hexdigest(path: str, size: int, algorithm: str) -> str:
+    hasher = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        if size > _MMAP_SIZE:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                hasher.update(data)
+        else:
+            hasher.update(f.read())
+    return hasher.hexdigest()
+
+
+def _same_bytes(path: str, size: int, expected: bytes) -> bool:
+    with open(path, 'rb') as f:
+        if size <= _MMAP_SIZE:
+            return f.read() == expected
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start in range(0, size, _MMAP_SIZE):
+                end = start + _MMAP_SIZE
+                if data[start:end] != expected[start:end]:
+                    return False
+    return True
+
+
+def _content_mismatch(path: str, expected: Any, encoding: str | None) -> tuple[Any, Any] | None:
+    # Returns None if the file has the expected content or, if not, what was expected
+    # and what was found in forms that can be compared to show the differences.
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return expected, not_there
+    if S_ISDIR(stat.st_mode):
+        return expected, _directory
+    size = stat.st_size
+    if isinstance(expected, FileHash):
+        digest = None
+        if expected.size is None or expected.size == size:
+            digest = _hexdigest(path, size, expected.algorithm)
+            if digest == expected.hexdigest:
+                return None
+        return expected, FileHash(
+            # Only hash the file here, so it can be shown, if its size was wrong:
+            digest or _hexdigest(path, size, expected.algorithm),
+            expected.algorithm,
+            None if expected.size is None else size,
+        )
+    text = isinstance(expected, str)
+    data = expected.encode(encoding or 'utf-8') if text else expected
+    if size == len(data) and _same_bytes(path, size, data):
+        return None
+    if max(size, len(data)) > _MMAP_SIZE:
+        # Too big to show, so show hashes instead:
+        return FileHash.of(data, size=True), FileHash(_hexdigest(path, size, 'sha256'), size=size)
+    with open(path, 'rb') as f:
+        found = f.read()
+    if text:
+        return expected, found.decode(encoding or 'utf-8', errors='replace')
+    return expected, found
 
 
 class TempDirectory:
@@ -19,9 +265,10 @@ class TempDirectory:
     A class representing a temporary directory on disk.
 
     :param ignore: A sequence of strings containing regular expression
-                   patterns that match filenames that should be
+                   patterns, or compiled patterns, that match filenames that should be
                    ignored by the :class:`TempDirectory` listing and
-                   checking methods.
+                   checking methods. If a directory is ignored, everything
+                   within it will also be ignored.
 
     :param create: If `True`, the temporary directory will be created
                    as part of class instantiation.
@@ -49,7 +296,7 @@ class TempDirectory:
             self,
             path: str | Path | None = None,
             *,
-            ignore: Sequence[str] = (),
+            ignore: Sequence[str | Pattern[str]] = (),
             create: bool | None = None,
             encoding: str | None = None,
             cwd: bool = False,
@@ -114,43 +361,84 @@ class TempDirectory:
         for i in tuple(cls.instances):
             i.cleanup()
 
+    def _ignored(self) -> _Ignored:
+        # A single function to check a path against all the ignore patterns.
+        if not self.ignore:
+            return None
+        if any(regex.flags != UNICODE or regex.groups for regex in self.ignore):
+            # Combining patterns would lose their flags or renumber their groups,
+            # breaking any backreferences:
+            return lambda path: any(regex.search(path) for regex in self.ignore)
+        return compile('|'.join(f'(?:{regex.pattern})' for regex in self.ignore)).search
+
     def actual(
             self,
             path: PathStrings | None = None,
             recursive: bool = False,
             files_only: bool = False,
             followlinks: bool = False,
+            workers: int | None = None,
     ) -> list[str]:
         path = self._join(path)
+        ignored = self._ignored()
 
-        result: list[str] = []
-        if recursive:
-            for dirpath, dirnames, filenames in os.walk(path, followlinks=followlinks):
-                dirpath = '/'.join(dirpath[len(path)+1:].split(os.sep))
-                if dirpath:
-                    dirpath += '/'
+        if not recursive:
+            return sorted(n for n in os.listdir(path) if ignored is None or not ignored(n))
 
-                for dirname in dirnames:
-                    if not files_only:
-                        result.append(dirpath+dirname+'/')
+        return sorted(
+            relative for relative, _ in _walk(path, files_only, followlinks, ignored, workers)
+        )
 
-                for name in sorted(filenames):
-                    result.append(dirpath+name)
-        else:
-            for n in os.listdir(path):
-                result.append(n)
-
-        filtered = []
-        for result_path in sorted(result):
-            ignore = False
-            for regex in self.ignore:
-                if regex.search(result_path):
-                    ignore = True
-                    break
-            if ignore:
-                continue
-            filtered.append(result_path)
-        return filtered
+    def snapshot(
+            self,
+            path: PathStrings | None = None,
+            followlinks: bool = False,
+            workers: int | None = None,
+    ) -> Snapshot:
+        """
+        Record the size, modification time and inode of every entry in the
+        temporary directory so that :meth:`changes_since` can later be used to find
+        out what has changed. Only the entries are looked at, the contents of
+        files are not read. Entries matching the ``ignore`` patterns are not recorded.
+
+        :param path: The path of the directory to take a snapshot of, relative to the
+                     root of the temporary directory. This can either be a tuple of
+                     strings or a forward-slash separated string. If it is not
+                     provided, the root of the temporary directory will be used.
+
+        :param followlinks: If ``True``, symlinks to directories will be followed.
+
+        :param workers: If supplied, subdirectories will be walked concurrently
+                        using a pool of this many threads.
+        """
+        return self._snapshot(self._join(path), followlinks, workers)
+
+    def _snapshot(self, root: str, followlinks: bool, workers: int | None) -> Snapshot:
+        entries = _walk(root, False, followlinks, self._ignored(), workers, stat=True)
+        return Snapshot(root, followlinks, dict(entries))  # type: ignore[arg-type]
+
+    def changes_since(self, snapshot: Snapshot, workers: int | None = None) -> Changes:
+        """
+        Return the entries that have been added, removed or modified since the
+        supplied :class:`Snapshot` was taken. Files are modified if their size,
+        modification time or inode have changed. Directories are only reported
+        when they are added or removed.
+
+        :param snapshot: A :class:`Snapshot` returned by :meth:`snapshot`.
+
+        :param workers: If supplied, subdirectories will be walked concurrently
+                        using a pool of this many threads.
+        """
+        before = snapshot.entries
+        after = self._snapshot(snapshot.path, snapshot.followlinks, workers).entries
+        return Changes(
+            added=sorted(after.keys() - before.keys()),
+            removed=sorted(before.keys() - after.keys()),
+            modified=sorted(
+                relative for relative, stat in after.items()
+                if not relative.endswith('/') and relative in before and before[relative] != stat
+            ),
+        )
 
     def listdir(self, path: PathStrings | None = None, recursive: bool = False) -> None:
         """
@@ -188,6 +476,7 @@ class TempDirectory:
             files_only: bool = False,
             recursive: bool = True,
             followlinks: bool = False,
+            workers: int | None = None,
     ) -> None:
         """
         Compare the expected contents with the actual contents of the temporary
@@ -220,16 +509,88 @@ class TempDirectory:
         :param followlinks: If ``True``, symlinks and hard links
                             will be followed when recursively building up
                             the actual list of directory contents.
+
+        :param workers: If supplied, subdirectories will be walked concurrently
+                        using a pool of this many threads when recursively building
+                        up the actual list of directory contents. This can be
+                        quicker when there are a lot of directories to walk.
         """
 
         __tracebackhide__ = True
     
         compare(expected=sorted(expected),
                 actual=tuple(self.actual(
-                    path, recursive, files_only, followlinks
+                    path, recursive, files_only, followlinks, workers
                 )),
                 recursive=False)
 
+    def compare_contents(
+            self,
+            expected: Mapping[str, bytes | str | FileHash],
+            path: PathStrings | None = None,
+            encoding: str | None = None,
+            workers: int | None = None,
+    ) -> None:
+        """
+        Compare the expected contents of files with their actual contents in the
+        temporary directory. An :class:`AssertionError` will be raised if they are
+        not the same. Only the files in ``expected`` are checked, so use
+        :meth:`compare` to check which files are present.
+
+        The size of each file is checked before it is read, and large files are
+        memory mapped rather than read into memory.
+
+        :param expected: A mapping of paths to their expected contents. The paths
+                         should be forward-slash separated and relative to
+                         the root of the temporary directory. The contents can be
+                         :class:`bytes`, a :class:`str` that will be encoded using
+                         ``encoding``, or a :class:`FileHash`.
+
+        :param path: The path to use as the root for the comparison,
+                     relative to the root of the temporary directory.
+                     This can either be:
+
+                     * A tuple of strings, making up the relative path.
+
+                     * A forward-slash separated string.
+
+                     If it is not provided, the root of the temporary
+                     directory will be used.
+
+        :param encoding: The encoding to use for expected contents that are strings.
+                         If not supplied, the encoding passed when the
+                         :class:`TempDirectory` was created will be used or, if none
+                         was passed, UTF-8.
+
+        :param workers: If supplied, files will be checked concurrently using a pool
+                        of this many threads.
+        """
+
+        __tracebackhide__ = True
+
+        root = self._join(path)
+        encoding = encoding or self.encoding
+
+        def check(relative: str) -> tuple[Any, Any] | None:
+            return _content_mismatch(
+                os.path.join(root, *relative.split('/')), expected[relative], encoding
+            )
+
+        if workers is None:
+            mismatches = list(map(check, expected))
+        else:
+            with ThreadPoolExecutor(workers) as pool:
+                mismatches = list(pool.map(check, expected))
+
+        expected_mismatches = {}
+        actual_mismatches = {}
+        for relative, mismatch in zip(expected, mismatches):
+            if mismatch is not None:
+                expected_mismatches[relative], actual = mismatch
+                if actual is not not_there:
+                    actual_mismatches[relative] = actual
+        compare(expected=expected_mismatches, actual=actual_mismatches)
+
     def _join(self, parts: str | Sequence[str] | None) -> str:
         if self.path is None:
             raise RuntimeError('Instantiated with create=False and .create() not called')
@@ -389,7 +750,7 @@ class TempDirectory:
 def tempdir(
         path: str | Path | None = None,
         *,
-        ignore: Sequence[str] = (),
+        ignore: Sequence[str | Pattern[str]] = (),
         encoding: str | None = None,
         cwd: bool = False,
 ) -> Callable[[Callable], Callable]:
@@ -1,12 +1,15 @@
 import re
 from abc import ABC
 from collections import namedtuple
+from dataclasses import dataclass
 from datetime import date, datetime, time
 from decimal import Decimal
 from functools import partial
 from re import compile
 from unittest import TestCase
 
+import pytest
+
 from testfixtures import (
     Comparison as C,
     Replacer,
@@ -15,7 +18,9 @@ from testfixtures import (
     generator,
     singleton,
 )
-from testfixtures.comparison import compare_sequence, compare_object
+from testfixtures.comparison import (
+    compare_sequence, compare_object, compare_simple, CompareCache, CompareProfile
+)
 from testfixtures.mock import Mock, call
 from testfixtures.shouldraise import ShouldAssert
 from testfixtures.tests.sample1 import Slotted
@@ -2266,3 +2271,284 @@ class TestDateAndTime:
             compare(
                 PandasDatetime(2000, 1, 1, fold=1), PandasDatetime(2000, 1, 1, fold=0), strict=True
             )
+
+
+class TestProfile:
+
+    def test_equal(self):
+        profile = CompareProfile()
+        compare([1, 2], [1, 2], profile=profile)
+        assert profile.nodes == 1
+        compare(dict(profile.calls), expected={'==': 1})
+        assert profile.deepest == ''
+        assert profile.message_length == 0
+
+    def test_nested(self):
+        profile = CompareProfile()
+        message = compare(
+            {'a': [1, {'b': 2}]}, {'a': [1, {'b': 3}]}, profile=profile, raises=False
+        )
+        assert profile.nodes == 5
+        compare(dict(profile.calls), expected={
+            '==': 1, 'compare_dict': 2, 'compare_sequence': 1, 'compare_simple': 1,
+        })
+        compare(set(profile.timings), expected=set(profile.calls))
+        assert all(timing >= 0 for timing in profile.timings.values())
+        assert profile.deepest == "['a'][1]['b']"
+        assert profile.message_length == len(message)
+
+    def test_str(self):
+        profile = CompareProfile()
+        compare(1, 2, profile=profile, raises=False)
+        text = hexsub(str(profile))
+        assert text.startswith('1 nodes, deepest at top level, message length 6\n'), text
+        assert 'compare_simple: 1 calls, ' in text, text
+
+    def test_comparer_raises(self):
+        def broken(x, y, context):
+            raise TypeError('boom')
+        profile = CompareProfile()
+        with ShouldRaise(TypeError('boom')):
+            compare(1, 2, comparers={int: broken}, profile=profile)
+        compare(dict(profile.calls), expected={'broken': 1})
+
+
+@dataclass(frozen=True)
+class Frozen:
+    x: int
+    y: tuple
+
+
+class TestCache:
+
+    def test_equal(self):
+        cache = CompareCache()
+        x, y = (1, (2, 3)), (1, (2, 3))
+        compare(x, y, cache=cache)
+        compare(x, y, cache=cache)
+        assert (cache.hits, cache.misses, len(cache)) == (1, 1, 1)
+
+    def test_different(self):
+        cache = CompareCache()
+        x, y = Frozen(1, (2,)), Frozen(1, (3,))
+        for _ in range(2):
+            with ShouldAssert(
+                "Frozen not as expected:\n\n"
+                "attributes same:\n['x']\n\n"
+                "attributes differ:\n"
+                "'y': (2,) != (3,)\n\n"
+                "While comparing .y: sequence not as expected:\n\n"
+                "same:\n()\n\n"
+                "first:\n(2,)\n\n"
+                "second:\n(3,)"
+            ):
+                compare(x, y, cache=cache)
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_prefix_and_suffix_not_cached(self):
+        cache = CompareCache()
+        with ShouldAssert('one: 1 != 2'):
+            compare(1, 2, cache=cache, prefix='one')
+        with ShouldAssert('1 != 2\ntwo'):
+            compare(1, 2, cache=cache, suffix='two')
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_parameters_part_of_key(self):
+        cache = CompareCache()
+        compare(1, 2, cache=cache, raises=False)
+        with ShouldAssert('1 (expected) != 2 (actual)'):
+            compare(expected=1, actual=2, cache=cache)
+        compare((1,), (1.0,), cache=cache)
+        with ShouldAssert('1 (<class \'int\'>) != 1.0 (<class \'float\'>)'):
+            compare(1, 1.0, cache=cache, strict=True)
+        assert (cache.hits, cache.misses, len(cache)) == (0, 4, 4)
+
+    def test_unhashable_not_cached(self):
+        cache = CompareCache()
+        for _ in range(2):
+            compare([1], [1], cache=cache)
+            compare(([1],), ([1],), cache=cache)
+            compare(1, 1, cache=cache, ignore_attributes={'x'})
+        assert (cache.hits, cache.misses, len(cache)) == (0, 6, 0)
+
+    def test_identity_hashed_not_cached(self):
+        cache = CompareCache()
+        o = object()
+        compare(o, o, cache=cache)
+        assert len(cache) == 0
+
+    def test_comparers_not_cached(self):
+        cache = CompareCache()
+        compare(1, 1, cache=cache, comparers={int: compare_simple})
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        cache = CompareCache(maxsize=2)
+        a, b, c = (1,), (2,), (3,)
+        compare(a, a, cache=cache)
+        compare(b, b, cache=cache)
+        compare(a, a, cache=cache)
+        compare(c, c, cache=cache)
+        assert len(cache) == 2
+        compare(a, a, cache=cache)
+        compare(b, b, cache=cache)
+        assert (cache.hits, cache.misses) == (2, 4)
+
+    def test_freed_objects_discarded(self):
+        cache = CompareCache()
+        x, y = Frozen(1, ()), Frozen(1, ())
+        compare(x, y, cache=cache)
+        assert len(cache) == 1
+        del x
+        assert len(cache) == 0
+
+    def test_clear(self):
+        cache = CompareCache()
+        compare((1,), (1,), cache=cache)
+        cache.clear()
+        assert len(cache) == 0
+
+
+class CountingLeaf:
+
+    eq_calls = 0
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        type(self).eq_calls += 1
+        return isinstance(other, CountingLeaf) and self.value == other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __repr__(self):
+        return f'<Leaf:{self.value}>'
+
+
+@dataclass
+class CaseInsensitive:
+    name: str
+
+    def __eq__(self, other):
+        return self.name.lower() == other.name.lower()
+
+    def __hash__(self):
+        return hash(self.name.lower())
+
+
+def nested(depth, leaf):
+    if depth:
+        return {'same': [CountingLeaf(i) for i in range(3)], 'child': nested(depth-1, leaf)}
+    return leaf
+
+
+def check_eq_calls(x, y, **kw):
+    CountingLeaf.eq_calls = 0
+    message = compare(x, y, raises=False, **kw)
+    return message, CountingLeaf.eq_calls
+
+
+class TestFewerEqualityChecks:
+
+    @pytest.mark.parametrize('option', ['fingerprints', 'single_pass'])
+    def test_same(self, option):
+        compare(nested(5, CountingLeaf(1)), nested(5, CountingLeaf(1)), **{option: True})
+
+    @pytest.mark.parametrize('option, expected_calls', [
+        # each leaf is checked once by the top-level equality check and
+        # then only once more while finding the differences:
+        ('fingerprints', 32),
+        # each leaf is only checked once:
+        ('single_pass', 16),
+    ])
+    def test_different(self, option, expected_calls):
+        x, y = nested(5, CountingLeaf(1)), nested(5, CountingLeaf(2))
+        expected_message, calls_without_option = check_eq_calls(x, y)
+        message, calls = check_eq_calls(x, y, **{option: True})
+        compare(message, expected=expected_message)
+        compare(calls, expected=expected_calls)
+        assert calls < calls_without_option
+
+
+class TestFingerprints:
+
+    def test_comparison_objects(self):
+        with ShouldAssert(
+            "dict not as expected:\n\n"
+            "same:\n['a']\n\n"
+            "values differ:\n"
+            "'b': [1, 2] != [1, 3]\n\n"
+            "While comparing ['b']: sequence not as expected:\n\n"
+            "same:\n[1]\n\n"
+            "first:\n[2]\n\n"
+            "second:\n[3]"
+        ):
+            compare({'a': [C(CountingLeaf)], 'b': [1, 2]},
+                    {'a': [CountingLeaf(1)], 'b': [1, 3]},
+                    fingerprints=True)
+
+    def test_ignore_attributes(self):
+        compare([TestIgnore.Parent(1, [3])], [TestIgnore.Parent(2, [3])],
+                ignore_attributes={'id'}, fingerprints=True)
+
+    def test_recursive(self):
+        x = [1]
+        x.append(x)
+        y = [2]
+        y.append(y)
+        compare(compare(x, y, raises=False, fingerprints=True),
+                expected=compare(x, y, raises=False))
+
+    def test_strict(self):
+        with ShouldAssert("[1] (<class 'list'>) != (1,) (<class 'tuple'>)"):
+            compare([1], (1,), strict=True, fingerprints=True)
+
+    def test_dataclass_with_own_eq(self):
+        compare([CaseInsensitive('A'), 1], [CaseInsensitive('a'), 1], fingerprints=True)
+        with ShouldAssert(
+            "sequence not as expected:\n\n"
+            "same:\n"
+            "[CaseInsensitive(name='A')]\n\n"
+            "first:\n[1]\n\n"
+            "second:\n[2]"
+        ):
+            compare([CaseInsensitive('A'), 1], [CaseInsensitive('a'), 2], fingerprints=True)
+
+    def test_not_fingerprinted_when_same(self):
+        with Replacer() as replace:
+            fingerprint = replace('testfixtures.comparison.CompareContext._fingerprint', Mock())
+            compare(nested(5, CountingLeaf(1)), nested(5, CountingLeaf(1)), fingerprints=True)
+        fingerprint.assert_not_called()
+
+
+class TestSinglePass:
+
+    def test_same_object(self):
+        nan = float('nan')
+        compare([nan], [nan], single_pass=True)
+
+    def test_sets(self):
+        compare({1, 2}, {2.0, 1.0}, single_pass=True)
+        with ShouldAssert('set not as expected:\n\n'
+                          'in first but not second:\n[1]\n\n'
+                          'in second but not first:\n[3]\n\n'):
+            compare({1, 2}, {2, 3}, single_pass=True)
+
+    def test_namedtuples_with_different_types(self):
+        TypeA = namedtuple('A', 'x')
+        TypeB = namedtuple('B', 'x')
+        compare(TypeA(1), TypeB(1), single_pass=True)
+        compare([TypeA(1)], (TypeB(1),), single_pass=True)
+
+    def test_subclass_with_different_equality(self):
+        class Lenient(dict):
+            def __eq__(self, other):
+                return True
+        compare(Lenient(x=1), Lenient(x=2), single_pass=True)
+
+    def test_custom_comparer(self):
+        def compare_anything(x, y, context):
+            return 'different'
+        compare({'a': 1}, {'a': 1}, comparers={dict: compare_anything}, single_pass=True)
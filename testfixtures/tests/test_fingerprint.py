@@ -0,0 +1,153 @@
+from collections import OrderedDict, namedtuple
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import pytest
+
+from testfixtures import (
+    Comparison as C, ShouldRaise, StringComparison as S, compare, generator
+)
+from testfixtures.comparison import fingerprint
+
+
+class Thing:
+
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+
+class OtherThing(Thing):
+    pass
+
+
+@dataclass(frozen=True)
+class Frozen:
+    x: int
+    y: tuple = ()
+    z: int = field(default=0, compare=False)
+
+
+@dataclass
+class Mutable:
+    x: list
+
+
+@dataclass
+class CaseInsensitive:
+    name: str
+
+    def __eq__(self, other):
+        return self.name.lower() == other.name.lower()
+
+    def __hash__(self):
+        return hash(self.name.lower())
+
+
+Pair = namedtuple('Pair', 'x y')
+
+
+class TestFingerprint:
+
+    @pytest.mark.parametrize('x, y', [
+        (1, 1.0),
+        ([1, 2], (1, 2)),
+        (True, 1),
+        (Decimal(1), 1),
+        ('a', 'a'),
+        ([1, [2, 3]], [1.0, [2, 3]]),
+        ((1, 2), Pair(1, 2)),
+        ({'a': [1]}, OrderedDict(a=[1])),
+        ({1, 2}, frozenset({2, 1})),
+        (Thing(x=1, y=[2]), Thing(x=1, y=[2])),
+        (Frozen(1, (2,), z=1), Frozen(1, (2,), z=2)),
+        (Mutable([1]), Mutable([1])),
+        (int, int),
+        (None, None),
+    ])
+    def test_same(self, x, y):
+        compare(x, y)
+        assert fingerprint(x) == fingerprint(y)
+
+    @pytest.mark.parametrize('x, y', [
+        (1, 2),
+        ([1, 2], [2, 1]),
+        ([1], ('1',)),
+        ({'a': 1}, {'a': 2}),
+        ({'a': 1}, {'b': 1}),
+        ({1}, {2}),
+        (Thing(x=1), Thing(x=2)),
+        (Thing(x=1), OtherThing(x=1)),
+        (Frozen(1), Frozen(2)),
+    ])
+    def test_different(self, x, y):
+        assert compare(x, y, raises=False)
+        assert fingerprint(x) != fingerprint(y)
+
+    def test_dataclass_with_own_eq(self):
+        assert CaseInsensitive('A') == CaseInsensitive('a')
+        compare(fingerprint(CaseInsensitive('A')), expected=fingerprint(CaseInsensitive('a')))
+
+    def test_strict(self):
+        assert fingerprint(1, strict=True) != fingerprint(1.0, strict=True)
+        assert fingerprint([1], strict=True) != fingerprint([1.0], strict=True)
+        assert fingerprint((1, 2), strict=True) != fingerprint(Pair(1, 2), strict=True)
+        assert fingerprint((1, 2), strict=True) != fingerprint([1, 2], strict=True)
+        assert fingerprint({}, strict=True) != fingerprint(OrderedDict(), strict=True)
+        assert fingerprint([1], strict=True) == fingerprint([1], strict=True)
+
+    def test_ignore_attributes(self):
+        x, y = Thing(x=1, y=2), Thing(x=1, y=3)
+        compare(x, y, ignore_attributes=['y'])
+        assert fingerprint(x, ignore_attributes=['y']) == fingerprint(y, ignore_attributes=['y'])
+
+    def test_ignore_attributes_per_type(self):
+        ignore = {Frozen: ['x']}
+        assert fingerprint([Frozen(1)], ignore_attributes=ignore) == \
+               fingerprint([Frozen(2)], ignore_attributes=ignore)
+        assert fingerprint([Thing(x=1)], ignore_attributes=ignore) != \
+               fingerprint([Thing(x=2)], ignore_attributes=ignore)
+
+    @pytest.mark.parametrize('obj', [
+        C(Thing),
+        [S('a')],
+        {'a': {'b': C(Thing)}},
+        generator(1, 2),
+        Thing(x=iter([1])),
+    ])
+    def test_not_possible(self, obj):
+        with ShouldRaise(TypeError):
+            fingerprint(obj)
+
+    def test_recursive(self):
+        x = []
+        x.append(x)
+        with ShouldRaise(TypeError('cannot fingerprint recursive structure: [[...]]')):
+            fingerprint(x)
+
+    def test_shared_structure(self):
+        shared = [1, 2]
+        assert fingerprint([shared, shared]) == fingerprint([[1, 2], [1, 2]])
+
+    def test_cache(self):
+        cache = {}
+        immutable = (1, ('a', frozenset({2})), Frozen(1, (2,)))
+        result = fingerprint([immutable], cache=cache)
+        compare(cache, expected={
+            id(immutable): (immutable, fingerprint(immutable)),
+            id(immutable[1]): (immutable[1], fingerprint(immutable[1])),
+            id(immutable[1][1]): (immutable[1][1], fingerprint(immutable[1][1])),
+            id(immutable[2]): (immutable[2], fingerprint(immutable[2])),
+            id(immutable[2].y): (immutable[2].y, fingerprint(immutable[2].y)),
+        })
+        assert fingerprint([immutable], cache=cache) == result
+
+    def test_cache_used(self):
+        obj = (1, 2)
+        cache = {id(obj): (obj, 42)}
+        assert fingerprint([obj], cache=cache) == fingerprint([42])
+
+    def test_mutable_not_cached(self):
+        cache = {}
+        fingerprint(([1], {'a': 1}, {1}, Thing(x=(1,)), Mutable([1]), Frozen(1, ([],))),
+                    cache=cache)
+        compare(list(cache.values()), expected=[((1,), fingerprint((1,)))])
@@ -1,9 +1,22 @@
-from logging import getLogger, ERROR, Filter, shutdown
+import asyncio
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
+from copy import copy
+from logging import Logger, LogRecord, getLogger, CRITICAL, DEBUG, ERROR, INFO, NOTSET, WARNING, Filter, shutdown
 from textwrap import dedent
+from threading import Barrier, Event, Lock, Thread
 from unittest import TestCase
 from warnings import catch_warnings
+from weakref import ref
 
-from testfixtures import Replacer, LogCapture, compare, Replace
+import pytest
+
+from testfixtures import (
+    Replacer, LogCapture, compare, Replace, Comparison as C, ShouldRaise, StringComparison as S
+)
+from testfixtures.logcapture import CompactRecord, event_fields
 from testfixtures.mock import Mock
 from testfixtures.shouldraise import ShouldAssert
 
@@ -645,3 +658,1150 @@ class TestCheckPresent:
                 ('root', 'WARNING', 'two'),
                 order_matters=False
             )
+
+
+class TestMaxRecords:
+
+    def test_under_limit(self):
+        with LogCapture(max_records=2) as log:
+            root.info('a')
+            root.info('b')
+        log.check(('root', 'INFO', 'a'), ('root', 'INFO', 'b'))
+        compare(log.dropped, expected={})
+
+    def test_over_limit(self):
+        with LogCapture(max_records=2) as log:
+            root.debug('a')
+            root.info('b')
+            root.info('c')
+            root.warning('d')
+        log.check(('root', 'INFO', 'c'), ('root', 'WARNING', 'd'))
+        compare(log.dropped, expected={'DEBUG': 1, 'INFO': 1})
+        compare(len(log), expected=2)
+        compare(log[0], expected=('root', 'INFO', 'c'))
+
+    def test_zero(self):
+        with LogCapture(max_records=0) as log:
+            root.info('a')
+        log.check()
+        compare(log.dropped, expected={'INFO': 1})
+
+    def test_dropped_unchecked(self):
+        log = LogCapture(max_records=1, ensure_checks_above=ERROR)
+        root.error('a')
+        root.error('b')
+        root.info('c')
+        log.uninstall()
+        with ShouldAssert(
+            "Not asserted ERROR log(s): []\n"
+            "2 more were dropped as max_records was reached"
+        ):
+            log.ensure_checked()
+        log.check(('root', 'INFO', 'c'))
+        with ShouldAssert(
+            "Not asserted ERROR log(s): []\n"
+            "2 more were dropped as max_records was reached"
+        ):
+            log.ensure_checked()
+
+    def test_dropped_unchecked_and_present(self):
+        log = LogCapture(max_records=1, ensure_checks_above=ERROR)
+        root.error('a')
+        root.error('b')
+        log.uninstall()
+        with ShouldAssert(
+            "Not asserted ERROR log(s): [('root', 'ERROR', 'b')]\n"
+            "1 more were dropped as max_records was reached"
+        ):
+            log.ensure_checked()
+
+    def test_dropped_after_checked(self):
+        log = LogCapture(max_records=1, ensure_checks_above=ERROR)
+        root.error('a')
+        log.check(('root', 'ERROR', 'a'))
+        root.info('b')
+        log.uninstall()
+        compare(log.dropped, expected={'ERROR': 1})
+        log.ensure_checked()
+
+    def test_dropped_below_level(self):
+        log = LogCapture(max_records=1, ensure_checks_above=ERROR)
+        root.warning('a')
+        root.info('b')
+        log.uninstall()
+        log.ensure_checked()
+
+    def test_clear(self):
+        log = LogCapture(max_records=1, ensure_checks_above=ERROR)
+        root.error('a')
+        root.error('b')
+        log.clear()
+        root.info('c')
+        root.info('d')
+        log.uninstall()
+        compare(log.dropped, expected={'INFO': 1})
+        log.ensure_checked()
+
+
+class TestCompact:
+
+    def test_check(self):
+        with LogCapture(compact=True) as log:
+            root.info('a %s', 'message')
+            one.error('an error')
+        log.check(('root', 'INFO', 'a message'), ('one', 'ERROR', 'an error'))
+        compare(log.records, expected=[
+            C(CompactRecord, name='root', levelno=INFO, levelname='INFO',
+              row=('root', 'INFO', 'a message'), checked=True, partial=True),
+            C(CompactRecord, name='one', levelno=ERROR, levelname='ERROR',
+              row=('one', 'ERROR', 'an error'), checked=True, partial=True),
+        ])
+
+    def test_original_record_not_kept(self):
+        records = []
+
+        class Keep(Filter):
+            def filter(self, record):
+                records.append(ref(record))
+                return True
+
+        with LogCapture(compact=True) as log:
+            log.addFilter(Keep())
+            try:
+                raise ValueError('boom')
+            except ValueError:
+                root.exception('failed')
+        compare(len(records), expected=1)
+        assert records[0]() is None
+        log.check(('root', 'ERROR', 'failed'))
+
+    def test_row_extracted_when_logged(self):
+        thing = ['before']
+        with LogCapture(compact=True, attributes=('getMessage',)) as log:
+            root.info('%s', thing)
+            thing[0] = 'after'
+        log.check("['before']")
+
+    def test_callable_attributes(self):
+        with LogCapture(compact=True, attributes=lambda r: r.levelname) as log:
+            root.warning('a')
+        compare(log.actual(), expected=['WARNING'])
+        compare(str(log.records[0]), expected="<CompactRecord: root, WARNING, 'WARNING'>")
+
+    def test_ensure_checked(self):
+        log = LogCapture(compact=True, ensure_checks_above=ERROR)
+        root.error('a')
+        root.error('b')
+        log.uninstall()
+        log.check_present(('root', 'ERROR', 'b'))
+        with ShouldAssert("Not asserted ERROR log(s): [('root', 'ERROR', 'a')]"):
+            log.ensure_checked()
+        assert ('root', 'ERROR', 'a') in log
+        log.ensure_checked()
+
+    def test_max_records(self):
+        with LogCapture(compact=True, max_records=1) as log:
+            root.info('a')
+            root.warning('b')
+        log.check(('root', 'WARNING', 'b'))
+        compare(log.dropped, expected={'INFO': 1})
+
+
+class TestRowCaching:
+
+    @staticmethod
+    def counting_capture(**kw):
+        extracted = []
+
+        def extract(record):
+            extracted.append(record.getMessage())
+            return record.getMessage()
+
+        return LogCapture(attributes=extract, **kw), extracted
+
+    def test_extracted_once(self):
+        log, extracted = self.counting_capture()
+        root.info('a')
+        root.error('b')
+        log.uninstall()
+        log.check('a', 'b')
+        log.check_present('b')
+        assert 'a' in log
+        compare(log[1], expected='b')
+        compare(str(log.actual()), expected="['a', 'b']")
+        log.ensure_checked(ERROR)
+        compare(extracted, expected=['a', 'b'])
+
+    def test_incremental(self):
+        log, extracted = self.counting_capture()
+        root.info('a')
+        log.check('a')
+        root.info('b')
+        log.uninstall()
+        log.check('a', 'b')
+        compare(extracted, expected=['a', 'b'])
+
+    def test_clear(self):
+        log, extracted = self.counting_capture()
+        root.info('a')
+        log.check('a')
+        log.clear()
+        root.info('b')
+        log.uninstall()
+        log.check('b')
+        compare(extracted, expected=['a', 'b'])
+
+    def test_records_replaced(self):
+        log, extracted = self.counting_capture()
+        root.info('a')
+        log.check('a')
+        log.records = log.records[:]
+        log.uninstall()
+        log.check('a')
+        compare(extracted, expected=['a', 'a'])
+
+    def test_records_truncated(self):
+        log, extracted = self.counting_capture()
+        root.info('a')
+        root.info('b')
+        log.check('a', 'b')
+        del log.records[:]
+        root.info('c')
+        log.check('c')
+        del log.records[:]
+        root.info('d')
+        root.info('e')
+        log.uninstall()
+        log.check('d', 'e')
+
+    def test_max_records(self):
+        log, extracted = self.counting_capture(max_records=2)
+        root.info('a')
+        root.info('b')
+        log.check('a', 'b')
+        root.info('c')
+        log.check('b', 'c')
+        root.info('d')
+        root.info('e')
+        log.uninstall()
+        log.check('d', 'e')
+        compare(extracted, expected=['a', 'b', 'c', 'd', 'e'])
+
+
+class TestQuery:
+
+    @staticmethod
+    def capture(**kw):
+        log = LogCapture(**kw)
+        getLogger('a').info('1')
+        getLogger('a.b').error('2')
+        getLogger('ab').warning('3')
+        getLogger('c').info('4')
+        getLogger('a').error('5')
+        log.uninstall()
+        return log
+
+    def test_all(self):
+        log = self.capture()
+        log.query().check(
+            ('a', 'INFO', '1'),
+            ('a.b', 'ERROR', '2'),
+            ('ab', 'WARNING', '3'),
+            ('c', 'INFO', '4'),
+            ('a', 'ERROR', '5'),
+        )
+
+    def test_name(self):
+        log = self.capture()
+        view = log.query(name='a')
+        view.check(
+            ('a', 'INFO', '1'),
+            ('a.b', 'ERROR', '2'),
+            ('a', 'ERROR', '5'),
+        )
+        compare(len(view), expected=3)
+        compare(view[1], expected=('a.b', 'ERROR', '2'))
+        assert ('a', 'ERROR', '5') in view
+
+    def test_level(self):
+        log = self.capture()
+        log.query(level=ERROR).check(
+            ('a.b', 'ERROR', '2'),
+            ('a', 'ERROR', '5'),
+        )
+
+    def test_name_and_level(self):
+        log = self.capture()
+        log.query(name='a', level=ERROR).check(
+            ('a.b', 'ERROR', '2'),
+            ('a', 'ERROR', '5'),
+        )
+        log.query(name='c', level=ERROR).check()
+
+    def test_time_range(self):
+        log = self.capture()
+        for i, record in enumerate(log.records):
+            record.created = float(i)
+        log.query(since=1, until=3).check(
+            ('a.b', 'ERROR', '2'),
+            ('ab', 'WARNING', '3'),
+        )
+        log.query(name='a', since=2).check(
+            ('a', 'ERROR', '5'),
+        )
+
+    def test_check_present(self):
+        log = self.capture()
+        log.query(name='a').check_present(('a', 'ERROR', '5'))
+        with ShouldAssert(dedent("""\
+            ignored:
+            [('a', 'INFO', '1'), ('a.b', 'ERROR', '2'), ('a', 'ERROR', '5')]
+
+            same:
+            []
+
+            expected:
+            [('c', 'INFO', '4')]
+
+            actual:
+            []""")):
+            log.query(name='a').check_present(('c', 'INFO', '4'))
+
+    def test_check_failure(self):
+        log = self.capture()
+        with ShouldAssert(dedent("""\
+            sequence not as expected:
+
+            same:
+            (('a', 'INFO', '1'),)
+
+            expected:
+            ()
+
+            actual:
+            (('a.b', 'ERROR', '2'), ('a', 'ERROR', '5'))""")):
+            log.query(name='a').check(('a', 'INFO', '1'))
+
+    def test_checks_marked_on_capture(self):
+        log = self.capture(ensure_checks_above=WARNING)
+        log.query(level=ERROR).check(
+            ('a.b', 'ERROR', '2'),
+            ('a', 'ERROR', '5'),
+        )
+        log.query(name='a').ensure_checked()
+        with ShouldAssert("Not asserted ERROR log(s): [('ab', 'WARNING', '3')]"):
+            log.ensure_checked()
+        log.query(name='ab').check(('ab', 'WARNING', '3'))
+        log.ensure_checked()
+
+    def test_view_is_snapshot(self):
+        log = LogCapture()
+        getLogger('a').info('1')
+        view = log.query()
+        getLogger('a').info('2')
+        log.uninstall()
+        view.check(('a', 'INFO', '1'))
+
+    def test_max_records(self):
+        log = self.capture(max_records=3)
+        log.query(name='a').check(('a', 'ERROR', '5'))
+        log.query(level=ERROR).check(('a', 'ERROR', '5'))
+        log.query(name='ab').check(('ab', 'WARNING', '3'))
+        log.query().check(
+            ('ab', 'WARNING', '3'),
+            ('c', 'INFO', '4'),
+            ('a', 'ERROR', '5'),
+        )
+
+    def test_records_modified(self):
+        log = self.capture()
+        del log.records[1:3]
+        log.query(name='a').check(
+            ('a', 'INFO', '1'),
+            ('a', 'ERROR', '5'),
+        )
+        log.records = log.records[1:]
+        log.query(level=INFO).check(
+            ('c', 'INFO', '4'),
+            ('a', 'ERROR', '5'),
+        )
+
+    def test_last_record_replaced_with_new_level(self):
+        log = self.capture()
+        log.query(name='a')
+        log.records.pop()
+        log.records.append(LogRecord('z', CRITICAL, 'z.py', 1, '6', (), None))
+        log.query(name='z').check(('z', 'CRITICAL', '6'))
+        compare(len(log.query(level=CRITICAL)), expected=1)
+
+    def test_compact(self):
+        log = self.capture(compact=True, attributes=('getMessage',))
+        log.query(name='a.b').check('2')
+
+    def test_cleared(self):
+        log = self.capture()
+        log.clear()
+        log.query(name='a').check()
+
+
+class TestPerThread:
+
+    def test_single_thread(self):
+        with LogCapture(per_thread=True) as log:
+            root.info('a')
+            root.error('b')
+        log.check(
+            ('root', 'INFO', 'a'),
+            ('root', 'ERROR', 'b'),
+        )
+
+    @pytest.mark.skipif(sys.version_info < (3, 12), reason='filters return records from 3.12')
+    def test_filter_returns_record(self):
+        def redact(record):
+            record = copy(record)
+            record.msg = 'redacted'
+            return record
+        log = LogCapture(per_thread=True, install=False)
+        log.addFilter(redact)
+        record = LogRecord('root', INFO, 'app.py', 1, 'secret', (), None)
+        returned = log.handle(record)
+        compare(returned.msg, expected='redacted')
+        log.check(('root', 'INFO', 'redacted'))
+        assert log.records[0] is returned
+
+    def test_filter_rejects_record(self):
+        log = LogCapture(per_thread=True, install=False)
+        log.addFilter(lambda record: False)
+        compare(log.handle(LogRecord('root', INFO, 'app.py', 1, 'a', (), None)), expected=False)
+        log.check()
+
+    def test_many_threads(self):
+        # all threads stay alive until all have logged, so idents aren't reused:
+        barrier = Barrier(5)
+
+        def work(name):
+            for i in range(100):
+                getLogger(name).info('%i', i)
+            barrier.wait()
+
+        threads = [Thread(target=work, args=(str(n),)) for n in range(5)]
+        with LogCapture(per_thread=True) as log:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        compare(len(log), expected=500)
+        for n, thread in enumerate(threads):
+            log.for_thread(thread).check(*((str(n), 'INFO', str(i)) for i in range(100)))
+        log.ensure_checked(INFO)
+
+    def test_merged_in_logged_order(self):
+        log = LogCapture(per_thread=True)
+        ready = Event()
+        done = Event()
+
+        def work():
+            ready.wait()
+            root.info('b')
+            done.set()
+
+        thread = Thread(target=work)
+        thread.start()
+        root.info('a')
+        ready.set()
+        done.wait()
+        root.info('c')
+        thread.join()
+        log.uninstall()
+        log.check(
+            ('root', 'INFO', 'a'),
+            ('root', 'INFO', 'b'),
+            ('root', 'INFO', 'c'),
+        )
+        log.for_thread().check(
+            ('root', 'INFO', 'a'),
+            ('root', 'INFO', 'c'),
+        )
+        log.for_thread(thread.ident).check(
+            ('root', 'INFO', 'b'),
+        )
+
+    def test_buffers_merged_when_read(self):
+        with LogCapture(per_thread=True) as log:
+            root.info('a')
+            log.check(('root', 'INFO', 'a'))
+            root.info('b')
+            compare(log.records[-1].getMessage(), expected='b')
+            root.info('c')
+            assert ('root', 'INFO', 'c') in log
+
+    def test_clear(self):
+        with LogCapture(per_thread=True) as log:
+            root.info('a')
+            log.clear()
+            root.info('b')
+        log.check(('root', 'INFO', 'b'))
+
+    def test_filter(self):
+        class OnlyB(Filter):
+            def filter(self, record):
+                return record.getMessage() == 'b'
+        with LogCapture(per_thread=True) as log:
+            log.addFilter(OnlyB())
+            root.info('a')
+            root.info('b')
+        log.check(('root', 'INFO', 'b'))
+
+    def test_max_records_and_compact(self):
+        with LogCapture(per_thread=True, max_records=2, compact=True) as log:
+            root.info('a')
+            root.info('b')
+            root.info('c')
+        log.check(
+            ('root', 'INFO', 'b'),
+            ('root', 'INFO', 'c'),
+        )
+        compare(log.dropped, expected={'INFO': 1})
+
+    def test_thread_not_started(self):
+        log = LogCapture(per_thread=True, install=False)
+        with ShouldRaise(ValueError):
+            log.for_thread(Thread())
+
+
+request_id: ContextVar[str] = ContextVar('request_id')
+
+
+class TestPerTask:
+
+    @staticmethod
+    async def handle(name: str, steps: int = 3) -> None:
+        request_id.set(name)
+        for i in range(steps):
+            getLogger(name).info('step %i', i)
+            await asyncio.sleep(0)
+
+    def test_tasks_interleaved(self):
+        async def main():
+            tasks = [asyncio.create_task(self.handle(name)) for name in ('a', 'b')]
+            await asyncio.gather(*tasks)
+            return tasks
+
+        with LogCapture(level=INFO, per_task=True) as log:
+            task_a, task_b = asyncio.run(main())
+        log.check(
+            ('a', 'INFO', 'step 0'),
+            ('b', 'INFO', 'step 0'),
+            ('a', 'INFO', 'step 1'),
+            ('b', 'INFO', 'step 1'),
+            ('a', 'INFO', 'step 2'),
+            ('b', 'INFO', 'step 2'),
+        )
+        log.for_task(task_a).check(
+            ('a', 'INFO', 'step 0'),
+            ('a', 'INFO', 'step 1'),
+            ('a', 'INFO', 'step 2'),
+        )
+        log.for_task(task_b).check_present(('b', 'INFO', 'step 1'))
+        compare(log.records[0].task, expected=task_a)
+
+    def test_current_task(self):
+        async def main():
+            await self.handle('a')
+            log.for_task().check(
+                ('a', 'INFO', 'step 0'),
+                ('a', 'INFO', 'step 1'),
+                ('a', 'INFO', 'step 2'),
+            )
+
+        with LogCapture(level=INFO, per_task=True) as log:
+            root.info('outside')
+            asyncio.run(main())
+        log.for_task().check(('root', 'INFO', 'outside'))
+        compare(log.records[0].task, expected=None)
+
+    def test_for_context(self):
+        async def main():
+            await asyncio.gather(self.handle('a', 2), self.handle('b', 2))
+
+        with LogCapture(level=INFO, per_task=True) as log:
+            asyncio.run(main())
+        log.for_context(request_id, 'b').check(
+            ('b', 'INFO', 'step 0'),
+            ('b', 'INFO', 'step 1'),
+        )
+        log.for_context(request_id, 'c').check()
+
+    def test_checked_on_capture(self):
+        async def main():
+            await asyncio.gather(self.handle('a', 1), self.handle('b', 1))
+
+        with LogCapture(level=INFO, per_task=True, ensure_checks_above=ERROR - 1) as log:
+            asyncio.run(main())
+            getLogger('a').error('boom')
+            log.for_task().check(('a', 'ERROR', 'boom'))
+        log.ensure_checked()
+
+    def test_compact_and_max_records(self):
+        async def main():
+            task = asyncio.create_task(self.handle('a'))
+            await task
+            return task
+
+        with LogCapture(level=INFO, per_task=True, compact=True, max_records=2) as log:
+            task = asyncio.run(main())
+        log.for_task(task).check(
+            ('a', 'INFO', 'step 1'),
+            ('a', 'INFO', 'step 2'),
+        )
+        compare(log.records[0].task, expected=task)
+
+    def test_records_modified(self):
+        async def main():
+            await self.handle('a', 2)
+
+        with LogCapture(level=INFO, per_task=True) as log:
+            asyncio.run(main())
+            root.info('outside')
+        del log.records[0]
+        log.for_task().check(('root', 'INFO', 'outside'))
+
+    def test_not_enabled(self):
+        log = LogCapture(install=False)
+        with ShouldRaise(TypeError('for_task() requires per_task=True')):
+            log.for_task()
+        with ShouldRaise(TypeError('for_context() requires per_task=True')):
+            log.for_context(request_id, 'a')
+
+
+class TestLevels:
+
+    def test_records_not_created(self):
+        created = []
+        original = Logger.makeRecord
+
+        def make_record(*args, **kw):
+            record = original(*args, **kw)
+            created.append(record.getMessage())
+            return record
+
+        with Replace('logging.Logger.makeRecord', make_record):
+            with LogCapture(levels={'noisy': WARNING}) as log:
+                getLogger('noisy').debug('debug')
+                getLogger('noisy.child').info('info')
+                getLogger('noisy').warning('warning')
+                getLogger('quiet').debug('quiet')
+        log.check(
+            ('noisy', 'WARNING', 'warning'),
+            ('quiet', 'DEBUG', 'quiet'),
+        )
+        compare(created, expected=['warning', 'quiet'])
+
+    def test_restored(self):
+        getLogger('noisy.child').setLevel(DEBUG)
+        try:
+            with LogCapture(levels={'noisy': ERROR, 'noisy.child': ERROR}) as log:
+                compare(getLogger('noisy').level, expected=ERROR)
+                compare(getLogger('noisy.child').level, expected=ERROR)
+                getLogger('noisy.child').warning('dropped')
+            log.check()
+            compare(getLogger('noisy').level, expected=NOTSET)
+            compare(getLogger('noisy.child').level, expected=DEBUG)
+        finally:
+            getLogger('noisy.child').setLevel(NOTSET)
+
+    def test_captured_logger(self):
+        with LogCapture('noisy', levels={'noisy': WARNING}) as log:
+            getLogger('noisy').info('info')
+            getLogger('noisy').warning('warning')
+        log.check(('noisy', 'WARNING', 'warning'))
+        compare(getLogger('noisy').level, expected=NOTSET)
+
+    def test_capped_by_ensure_checks_above(self):
+        log = LogCapture(levels={'noisy': ERROR}, ensure_checks_above=WARNING)
+        getLogger('noisy').info('info')
+        getLogger('noisy').warning('warning')
+        log.uninstall()
+        with ShouldAssert("Not asserted ERROR log(s): [('noisy', 'WARNING', 'warning')]"):
+            log.ensure_checked()
+        log.check(('noisy', 'WARNING', 'warning'))
+
+
+class TestSpool:
+
+    def test_check(self):
+        with LogCapture(spool=True) as log:
+            root.info('a %s', 'message')
+            getLogger('other').error('b')
+        log.check(
+            ('root', 'INFO', 'a message'),
+            ('other', 'ERROR', 'b'),
+        )
+        compare(len(log), expected=2)
+        compare(log[1], expected=('other', 'ERROR', 'b'))
+        compare(log[-1], expected=('other', 'ERROR', 'b'))
+        compare(str(log), expected="root INFO\n  a message\nother ERROR\n  b")
+
+    def test_records_not_kept(self):
+        class Big:
+            pass
+        big = Big()
+        with LogCapture(spool=True) as log:
+            root.info('%s', 'x', extra={'big': big})
+        big_ref = ref(big)
+        del big
+        assert big_ref() is None
+        log.check(('root', 'INFO', 'x'))
+
+    def test_records(self):
+        with LogCapture(spool=True) as log:
+            root.warning('a')
+        record = log.records[0]
+        compare(repr(record), expected="<SpooledRecord: root, WARNING, ('root', 'WARNING', 'a')>")
+        compare(record.name, expected='root')
+        compare(record.levelno, expected=WARNING)
+        compare([r.row for r in log.records], expected=[('root', 'WARNING', 'a')])
+        with ShouldRaise(IndexError('record index out of range')):
+            log.records[1]
+
+    def test_write_after_read(self):
+        with LogCapture(spool=True) as log:
+            root.info('a')
+            log.check(('root', 'INFO', 'a'))
+            root.info('b')
+            root.info('c')
+            log.check_present(('root', 'INFO', 'b'))
+            root.info('d')
+        log.check(
+            ('root', 'INFO', 'a'),
+            ('root', 'INFO', 'b'),
+            ('root', 'INFO', 'c'),
+            ('root', 'INFO', 'd'),
+        )
+
+    def test_ensure_checked(self):
+        log = LogCapture(spool=True, ensure_checks_above=WARNING)
+        root.error('a')
+        root.error('b')
+        log.uninstall()
+        assert ('root', 'ERROR', 'a') in log
+        with ShouldAssert("Not asserted ERROR log(s): [('root', 'ERROR', 'b')]"):
+            log.ensure_checked()
+        log.check_present(('root', 'ERROR', 'b'))
+        log.ensure_checked()
+
+    def test_records_loaded(self):
+        log = LogCapture(spool=True, ensure_checks_above=WARNING)
+        for i in range(10):
+            root.info('info %s', i)
+        root.error('a')
+        root.error('b')
+        log.uninstall()
+        load = log.records._load = Mock(wraps=log.records._load)
+        log.check_present(('root', 'ERROR', 'a'))
+        compare(load.call_count, expected=13)
+        load.reset_mock()
+        with ShouldAssert("Not asserted ERROR log(s): [('root', 'ERROR', 'b')]"):
+            log.ensure_checked()
+        compare(load.call_count, expected=1)
+        load.reset_mock()
+        log.mark_all_checked()
+        log.ensure_checked()
+        compare(load.call_count, expected=0)
+
+    def test_query(self):
+        with LogCapture(spool=True) as log:
+            getLogger('a').info('1')
+            getLogger('b').error('2')
+        log.query(level=ERROR).check(('b', 'ERROR', '2'))
+        log.for_thread().check(('a', 'INFO', '1'), ('b', 'ERROR', '2'))
+
+    def test_clear(self):
+        with LogCapture(spool=True) as log:
+            root.info('a')
+            file = log.records.file
+            log.clear()
+            root.info('b')
+        log.check(('root', 'INFO', 'b'))
+        assert file.closed
+
+    def test_close(self):
+        log = LogCapture(spool=True)
+        root.info('a')
+        log.uninstall()
+        log.close()
+        assert log.records.file.closed
+
+    def test_read_while_logging(self):
+        def log_many():
+            for _ in range(5000):
+                root.info('a')
+
+        with LogCapture(spool=True) as log:
+            thread = Thread(target=log_many)
+            thread.start()
+            records = log.records
+            while thread.is_alive():
+                if records:
+                    compare(records[-1].row, expected=('root', 'INFO', 'a'))
+            thread.join()
+        compare(len(log), expected=5000)
+
+    def test_attributes_callable(self):
+        with LogCapture(spool=True, attributes=lambda r: {'message': r.getMessage()}) as log:
+            root.info('a')
+        log.check({'message': 'a'})
+
+    def test_not_with_max_records(self):
+        with ShouldRaise(TypeError('spool cannot be used with max_records or per_task')):
+            LogCapture(spool=True, max_records=10, install=False)
+
+
+class TestCheckpoint:
+
+    def test_check_since(self):
+        with LogCapture() as log:
+            root.info('a')
+            cursor = log.checkpoint()
+            root.info('b')
+            root.info('c')
+            log.check_since(cursor, ('root', 'INFO', 'b'), ('root', 'INFO', 'c'))
+            cursor = log.checkpoint()
+            log.check_since(cursor)
+            root.info('d')
+            log.check_since(cursor, ('root', 'INFO', 'd'))
+        log.check(
+            ('root', 'INFO', 'a'),
+            ('root', 'INFO', 'b'),
+            ('root', 'INFO', 'c'),
+            ('root', 'INFO', 'd'),
+        )
+
+    def test_check_since_fails(self):
+        with LogCapture() as log:
+            root.info('a')
+            cursor = log.checkpoint()
+            root.info('b')
+            with ShouldAssert(dedent("""\
+                sequence not as expected:
+
+                same:
+                ()
+
+                expected:
+                (('root', 'INFO', 'a'),)
+
+                actual:
+                (('root', 'INFO', 'b'),)""")):
+                log.check_since(cursor, ('root', 'INFO', 'a'))
+
+    def test_check_present_since(self):
+        with LogCapture() as log:
+            root.info('a')
+            cursor = log.checkpoint()
+            root.info('b')
+            root.info('c')
+            log.check_present_since(cursor, ('root', 'INFO', 'c'))
+            log.check_present_since(
+                cursor, ('root', 'INFO', 'c'), ('root', 'INFO', 'b'), order_matters=False
+            )
+            with ShouldAssert(dedent("""\
+                ignored:
+                [('root', 'INFO', 'b'), ('root', 'INFO', 'c')]
+
+                same:
+                []
+
+                expected:
+                [('root', 'INFO', 'a')]
+
+                actual:
+                []""")):
+                log.check_present_since(cursor, ('root', 'INFO', 'a'))
+
+    def test_ensure_checked(self):
+        with LogCapture(ensure_checks_above=INFO) as log:
+            root.warning('a')
+            cursor = log.checkpoint()
+            root.warning('b')
+            log.check_since(cursor, ('root', 'WARNING', 'b'))
+            with ShouldAssert("Not asserted ERROR log(s): [('root', 'WARNING', 'a')]"):
+                log.ensure_checked()
+            log.check_present(('root', 'WARNING', 'a'))
+
+    def test_rows_only_extracted_once(self):
+        extracted = []
+
+        def extract(record):
+            extracted.append(record.getMessage())
+            return record.getMessage()
+
+        with LogCapture(attributes=extract) as log:
+            root.info('a')
+            cursor = log.checkpoint()
+            root.info('b')
+            log.check_since(cursor, 'b')
+            cursor = log.checkpoint()
+            root.info('c')
+            log.check_since(cursor, 'c')
+        compare(extracted, expected=['a', 'b', 'c'])
+
+    def test_max_records(self):
+        with LogCapture(max_records=2) as log:
+            root.info('a')
+            cursor = log.checkpoint()
+            root.info('b')
+            root.info('c')
+            log.check_since(cursor, ('root', 'INFO', 'b'), ('root', 'INFO', 'c'))
+            root.info('d')
+            log.check_since(cursor, ('root', 'INFO', 'c'), ('root', 'INFO', 'd'))
+            cursor = log.checkpoint()
+            root.info('e')
+            log.check_since(cursor, ('root', 'INFO', 'e'))
+
+    def test_spool(self):
+        with LogCapture(spool=True) as log:
+            root.info('a')
+            cursor = log.checkpoint()
+            root.info('b')
+            log.check_since(cursor, ('root', 'INFO', 'b'))
+
+    def test_since_view(self):
+        with LogCapture() as log:
+            cursor = log.checkpoint()
+            root.info('a')
+            compare(len(log.since(cursor)), expected=1)
+            compare(log.since(log.checkpoint()).actual(), expected=[])
+            log.mark_all_checked()
+
+
+def log_in_process(i):
+    getLogger('worker').info('work %i', i)
+    getLogger('worker.noisy').debug('junk')
+    return i
+
+
+def log_event_in_process(i):
+    getLogger('worker').info({'event': 'work', 'i': i})
+    getLogger('worker').info({'event': 'lock', 'lock': Lock()})
+
+
+def log_exception_in_process():
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        getLogger('worker').exception('failed')
+
+
+class TestProcesses:
+
+    @pytest.mark.parametrize('method', multiprocessing.get_all_start_methods())
+    def test_pool(self, method):
+        context = multiprocessing.get_context(method)
+        with LogCapture(processes=context, levels={'worker.noisy': INFO}) as log:
+            pool = context.Pool(2, initializer=log.initializer, initargs=log.initargs)
+            compare(sorted(pool.map(log_in_process, range(3))), expected=[0, 1, 2])
+            pool.close()
+            pool.join()
+            log.flush()
+            log.check_present(
+                ('worker', 'INFO', 'work 0'),
+                ('worker', 'INFO', 'work 1'),
+                ('worker', 'INFO', 'work 2'),
+                order_matters=False,
+            )
+        compare(len(log), expected=3)
+
+    def test_process_pool_executor(self):
+        context = multiprocessing.get_context('spawn')
+        with LogCapture(processes=context) as log:
+            with ProcessPoolExecutor(
+                1, mp_context=context, initializer=log.initializer, initargs=log.initargs
+            ) as executor:
+                executor.submit(log_in_process, 1).result()
+        log.check(
+            ('worker', 'INFO', 'work 1'),
+            ('worker.noisy', 'DEBUG', 'junk'),
+        )
+
+    def test_exception(self):
+        context = multiprocessing.get_context('spawn')
+        with LogCapture(processes=context) as log:
+            pool = context.Pool(1, initializer=log.initializer, initargs=log.initargs)
+            pool.apply(log_exception_in_process)
+            pool.close()
+            pool.join()
+        log.check(('worker', 'ERROR', 'failed'))
+        record = log.records[0]
+        compare(record.exc_info, expected=None)
+        assert record.exc_text.endswith('ValueError: boom'), record.exc_text
+
+    def test_structured(self):
+        context = multiprocessing.get_context('spawn')
+        with LogCapture(processes=context, structured=True) as log:
+            pool = context.Pool(1, initializer=log.initializer, initargs=log.initargs)
+            pool.apply(log_event_in_process, (1,))
+            pool.close()
+            pool.join()
+        log.check(
+            {'logger': 'worker', 'event': 'work', 'i': 1},
+            {'logger': 'worker', 'event': S(r"\{'event': 'lock', 'lock': <unlocked .+>\}")},
+        )
+
+    def test_parent_logging_still_captured(self):
+        with LogCapture(processes=True) as log:
+            root.info('parent')
+        log.check(('root', 'INFO', 'parent'))
+
+    def test_reinstall(self):
+        log = LogCapture(processes=multiprocessing.get_context('spawn'))
+        log.uninstall()
+        log.install()
+        root.info('again')
+        log.uninstall()
+        log.check(('root', 'INFO', 'again'))
+
+    def test_queue_closed_on_uninstall(self):
+        log = LogCapture(processes=multiprocessing.get_context('spawn'))
+        queue = log.initargs[0]
+        log.uninstall()
+        with ShouldRaise(ValueError):
+            queue.put('late')
+        with ShouldRaise(TypeError('initargs requires this LogCapture to be installed')):
+            log.initargs
+
+    def test_flush_keeps_listener(self):
+        context = multiprocessing.get_context('spawn')
+        with LogCapture(processes=context) as log:
+            listener = log._listener
+            thread = listener._thread
+            pool = context.Pool(1, initializer=log.initializer, initargs=log.initargs)
+            pool.apply(log_in_process, (1,))
+            # Joining ensures the child has finished sending its records:
+            pool.close()
+            pool.join()
+            log.flush()
+            log.check(
+                ('worker', 'INFO', 'work 1'),
+                ('worker.noisy', 'DEBUG', 'junk'),
+            )
+            assert log._listener is listener
+            assert listener._thread is thread
+            compare(listener.flushed, expected={})
+
+    def test_not_enabled(self):
+        log = LogCapture(install=False)
+        with ShouldRaise(TypeError('initializer requires processes to be used')):
+            log.initializer
+        with ShouldRaise(TypeError('initargs requires processes to be used')):
+            log.initargs
+        log.flush()
+
+
+class TestStructured:
+
+    def test_event_fields(self):
+        record = LogRecord('app', INFO, 'app.py', 1, 'hello %s', ('world',), None)
+        record.request_id = 42
+        compare(event_fields(record), expected={
+            'logger': 'app', 'level': 'INFO', 'event': 'hello world', 'request_id': 42,
+        })
+
+    def test_event_fields_mapping_message(self):
+        record = LogRecord('app', INFO, 'app.py', 1, {'event': 'hello', 'user': 'bob'}, (), None)
+        compare(event_fields(record), expected={
+            'logger': 'app', 'level': 'INFO', 'event': 'hello', 'user': 'bob',
+        })
+
+    def test_check_partial(self):
+        with LogCapture(structured=True) as log:
+            getLogger('app').info('received', extra={'request_id': 1, 'path': '/'})
+            getLogger('app').info({'event': 'handled', 'request_id': 1, 'status': 200})
+        log.check(
+            {'event': 'received', 'request_id': 1},
+            {'event': 'handled', 'status': 200},
+        )
+        compare(log[1], expected={
+            'logger': 'app', 'level': 'INFO', 'event': 'handled', 'request_id': 1, 'status': 200
+        })
+
+    def test_check_fails(self):
+        with LogCapture(structured=True) as log:
+            getLogger('app').info('received', extra={'request_id': 1})
+        with ShouldAssert(dedent("""\
+            sequence not as expected:
+
+            same:
+            ()
+
+            expected:
+            (
+            <MappingComparison(ordered=False, partial=True)(failed)>
+            ignored:
+            ['event', 'level', 'logger']
+
+            values differ:
+            'request_id': 2 (expected) != 1 (actual)
+            </MappingComparison(ordered=False, partial=True)>,)
+
+            actual:
+            ({'event': 'received', 'level': 'INFO', 'logger': 'app', 'request_id': 1},)""")):
+            log.check({'request_id': 2})
+        log.check({'request_id': 1})
+
+    def test_check_present(self):
+        with LogCapture(structured=True) as log:
+            getLogger('app').info('a', extra={'request_id': 1})
+            getLogger('app').info('b', extra={'request_id': 2})
+        log.check_present({'request_id': 2, 'event': 'b'})
+        with ShouldRaise(AssertionError):
+            log.check_present({'request_id': 3})
+
+    def test_str(self):
+        with LogCapture(structured=True) as log:
+            getLogger('app').info('a', extra={'request_id': 1})
+            getLogger('app').error({'event': 'b', 'user': 'bob'})
+        compare(str(log), expected=(
+            "app INFO\n  {'event': 'a', 'request_id': 1}\n"
+            "app ERROR\n  {'event': 'b', 'user': 'bob'}"
+        ))
+        compare(str(log.query(level=ERROR)), expected="app ERROR\n  {'event': 'b', 'user': 'bob'}")
+
+    def test_query_fields(self):
+        with LogCapture(structured=True) as log:
+            getLogger('app').info('a', extra={'request_id': 1})
+            getLogger('app').error('b', extra={'request_id': 2})
+            getLogger('other').info('c', extra={'request_id': 1})
+        log.query(fields={'request_id': 1}).check({'event': 'a'}, {'event': 'c'})
+        log.query(name='app', fields={'request_id': 1}).check({'event': 'a'})
+
+    def test_query_indexed_fields(self):
+        with LogCapture(structured=True, index_fields=('request_id',)) as log:
+            getLogger('app').info('a', extra={'request_id': 1})
+            getLogger('app').error('b', extra={'request_id': 2, 'user': 'x'})
+            getLogger('other').info({'event': 'c', 'request_id': 1})
+            getLogger('other').info('d', extra={'request_id': [1]})
+        log.query(fields={'request_id': 1}).check({'event': 'a'}, {'event': 'c'})
+        log.query(fields={'request_id': 2, 'user': 'x'}).check({'event': 'b'})
+        log.query(fields={'request_id': 2, 'user': 'y'}).check()
+        log.query(name='other', fields={'request_id': 1}).check({'event': 'c'})
+        log.query(level=ERROR, fields={'request_id': 1}).check()
+        log.query(fields={'request_id': [1]}).check({'event': 'd'})
+
+    def test_indexed_fields_max_records(self):
+        with LogCapture(structured=True, index_fields=('request_id',), max_records=2) as log:
+            getLogger('app').info('a', extra={'request_id': 1})
+            getLogger('app').info('b', extra={'request_id': 2})
+            getLogger('app').info('c', extra={'request_id': 1})
+        log.query(fields={'request_id': 1}).check({'event': 'c'})
+
+    def test_indexed_fields_compact(self):
+        with LogCapture(structured=True, index_fields=('request_id',), compact=True) as log:
+            getLogger('app').info('a', extra={'request_id': 1})
+            getLogger('app').info('b', extra={'request_id': 2})
+        log.query(fields={'request_id': 2}).check({'event': 'b'})
+
+    def test_fields_not_structured(self):
+        log = LogCapture(install=False)
+        with ShouldRaise(TypeError('fields can only be queried when structured=True')):
+            log.query(fields={'request_id': 1})
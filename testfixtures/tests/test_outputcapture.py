@@ -1,8 +1,14 @@
+import asyncio
+import os
 import sys
+from contextvars import copy_context
 from subprocess import call
+from threading import Barrier, Thread
 from unittest import TestCase
 
-from testfixtures import OutputCapture, compare
+import pytest
+
+from testfixtures import OutputCapture, ShouldAssert, ShouldRaise, compare, StringComparison as S
 from .test_compare import CompareHelper
 
 
@@ -105,6 +111,24 @@ class TestOutputCapture(CompareHelper, TestCase):
 
 class TestOutputCaptureWithDescriptors:
 
+    def test_fd_read_new(self, capfd):
+        with capfd.disabled(), OutputCapture(fd=True) as o:
+            call([sys.executable, '-c', "import sys; sys.stdout.write('out')"])
+            compare(o.read_new(), expected='out')
+            call([sys.executable, '-c', "import sys; sys.stderr.write('\u65e5')"])
+            compare(o.read_new(), expected='\u65e5')
+            compare(o.read_new(), expected='')
+            call([sys.executable, '-c', "import sys; sys.stdout.write('more')"])
+        compare(o.read_new(), expected='more')
+        compare(o.captured, expected='out\u65e5more')
+
+    def test_fd_read_new_separate(self, capfd):
+        with capfd.disabled(), OutputCapture(fd=True, separate=True) as o:
+            call([sys.executable, '-c', "import sys; sys.stdout.write('out')"])
+            call([sys.executable, '-c', "import sys; sys.stderr.write('err')"])
+            compare(o.read_new('stderr'), expected='err')
+            compare(o.read_new('stdout'), expected='out')
+
     def test_fd(self, capfd):
         with capfd.disabled(), OutputCapture(fd=True) as o:
             call([sys.executable, '-c', "import sys; sys.stdout.write('out')"])
@@ -118,3 +142,370 @@ class TestOutputCaptureWithDescriptors:
             call([sys.executable, '-c', "import sys; sys.stderr.write('err')"])
         compare(o.captured, expected='')
         o.compare(stdout='out', stderr='err')
+
+    def test_read_new(self):
+        with OutputCapture() as o:
+            print('first')
+            compare(o.read_new(), expected='first\n')
+            compare(o.read_new(), expected='')
+            print('second', file=sys.stderr)
+            print('third')
+            compare(o.read_new(), expected='second\nthird\n')
+        compare(o.captured, expected='first\nsecond\nthird\n')
+
+    def test_read_new_separate(self):
+        with OutputCapture(separate=True) as o:
+            print('out')
+            print('err', file=sys.stderr)
+            compare(o.read_new('stdout'), expected='out\n')
+            print('more err', file=sys.stderr)
+            compare(o.read_new('stderr'), expected='err\nmore err\n')
+            compare(o.read_new('stdout'), expected='')
+        o.compare(stdout='out', stderr='err\nmore err')
+
+    def test_reset_part_way_through(self):
+        with OutputCapture() as o:
+            print('first')
+            compare(o.read_new(), expected='first\n')
+            o.output.seek(0)
+            o.output.truncate()
+            compare(o.read_new(), expected='')
+            print('second')
+            o.output.seek(0)
+            compare(o.output.read(), expected='second\n')
+        o.compare('second')
+
+    def test_max_size_spill(self):
+        with OutputCapture(max_size=10) as o:
+            print('12345')
+            compare(o.read_new(), expected='12345\n')
+            assert o.output._file is None
+            print('日' * 5)
+            assert o.output._file is not None
+            compare(o.read_new(), expected='日' * 5 + '\n')
+            print('after')
+            compare(o.read_new(), expected='after\n')
+        compare(o.captured, expected='12345\n' + '日' * 5 + '\nafter\n')
+        o.compare('12345\n' + '日' * 5 + '\nafter')
+
+    def test_max_size_truncate(self):
+        with OutputCapture(max_size=10, overflow='truncate') as o:
+            for i in range(10):
+                print(i)
+            compare(o.read_new(), expected='5\n6\n7\n8\n9\n')
+            for i in range(10, 100):
+                sys.stdout.write(str(i % 10))
+            compare(o.read_new(), expected='0123456789')
+        compare(o.captured, expected='0123456789')
+        assert len(o.output._memory.getvalue()) <= 20
+
+    def test_max_size_truncate_partially_read(self):
+        with OutputCapture(max_size=4, overflow='truncate') as o:
+            sys.stdout.write('ab')
+            compare(o.read_new(), expected='ab')
+            sys.stdout.write('cdefghijk')
+            compare(o.read_new(), expected='hijk')
+
+    def test_max_size_with_fd(self):
+        with ShouldRaise(TypeError('max_size cannot be used with fd=True unless pipe=True')):
+            OutputCapture(fd=True, max_size=10)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='pipes cannot be selected on Windows')
+class TestOutputCaptureWithPipes:
+
+    def test_combined(self, capfd):
+        with capfd.disabled(), OutputCapture(fd=True, pipe=True) as o:
+            call([sys.executable, '-c', "import sys; sys.stdout.write('out')"])
+            call([sys.executable, '-c', "import sys; sys.stderr.write('err')"])
+            print('py', flush=True)
+            os.write(2, b'direct')
+            compare(o.captured, expected='outerrpy\ndirect')
+        o.compare(expected='outerrpy\ndirect')
+
+    def test_separate(self, capfd):
+        with capfd.disabled(), OutputCapture(fd=True, pipe=True, separate=True) as o:
+            call([sys.executable, '-c', "import sys; sys.stdout.write('out')"])
+            call([sys.executable, '-c', "import sys; sys.stderr.write('err')"])
+        compare(o.captured, expected='')
+        o.compare(stdout='out', stderr='err')
+
+    def test_unflushed_python_output(self, capfd):
+        with capfd.disabled(), OutputCapture(fd=True, pipe=True) as o:
+            sys.stdout.write('unflushed')
+            compare(o.read_new(), expected='unflushed')
+        compare(o.captured, expected='unflushed')
+
+    def test_large_output(self, capfd):
+        # much larger than a pipe's buffer, so would deadlock without the reader:
+        code = "import sys; sys.stdout.write('x' * 1000000)"
+        with capfd.disabled(), OutputCapture(fd=True, pipe=True) as o:
+            call([sys.executable, '-c', code])
+        compare(len(o.captured), expected=1000000)
+
+    def test_max_size(self, capfd):
+        code = "import sys; sys.stdout.write('x' * 100000 + 'end')"
+        with capfd.disabled(), OutputCapture(
+                fd=True, pipe=True, max_size=10, overflow='truncate'
+        ) as o:
+            call([sys.executable, '-c', code])
+        compare(o.captured, expected='xxxxxxxend')
+
+    def test_read_new(self, capfd):
+        with capfd.disabled(), OutputCapture(fd=True, pipe=True) as o:
+            os.write(1, '\u65e5'.encode()[:2])
+            compare(o.read_new(), expected='')
+            os.write(1, '\u65e5'.encode()[2:])
+            compare(o.read_new(), expected='\u65e5')
+
+    def test_pipe_requires_fd(self):
+        with ShouldRaise(TypeError('pipe can only be used with fd=True')):
+            OutputCapture(pipe=True)
+
+
+class TestCompareLines:
+
+    def test_match(self):
+        with OutputCapture() as o:
+            print('first')
+            print('second 2', file=sys.stderr)
+        o.compare_lines('first', S(r'second \d'))
+
+    def test_mismatch(self):
+        with OutputCapture() as o:
+            print('a\nb\nc')
+        with ShouldAssert(
+            "captured lines not as expected:\n"
+            "line 2: 'x' (expected) != 'b' (actual)\n"
+            "line 4: 'd' (expected) != <not_there> (actual)"
+        ):
+            o.compare_lines('a', 'x', 'c', 'd')
+
+    def test_extra_actual(self):
+        with OutputCapture() as o:
+            print('a\nb')
+        with ShouldAssert(
+            "captured lines not as expected:\n"
+            "line 2: <not_there> (expected) != 'b' (actual)"
+        ):
+            o.compare_lines('a')
+
+    def test_stops_after_max_mismatches(self):
+        lines = []
+
+        def numbers():
+            for i in range(100):
+                lines.append(i)
+                yield str(i)
+
+        with OutputCapture() as o:
+            pass
+        o._lines = lambda stream: numbers()
+        with ShouldAssert(
+            "captured lines not as expected:\n"
+            "line 1: 'x' (expected) != '0' (actual)\n"
+            "line 2: <not_there> (expected) != '1' (actual)"
+        ):
+            o.compare_lines('x', max_mismatches=2)
+        # one line further is read to see if the last line is trailing whitespace:
+        compare(lines, expected=[0, 1, 2])
+
+    def test_strip_whitespace(self):
+        with OutputCapture() as o:
+            print('\n\n  a\n\n  b  \n\n')
+        o.compare_lines('  a', '', '  b  ')
+
+    def test_strip_whitespace_off(self):
+        with OutputCapture(strip_whitespace=False) as o:
+            print('\n  a ')
+        o.compare_lines('', '  a ')
+        with ShouldAssert(
+            "captured lines not as expected:\n"
+            "line 1: 'a' (expected) != '' (actual)\n"
+            "line 2: <not_there> (expected) != '  a ' (actual)"
+        ):
+            o.compare_lines('a')
+
+    def test_partial(self):
+        with OutputCapture() as o:
+            print('a\nb\nc\nd')
+        o.compare_lines('b', S('d'), partial=True)
+        with ShouldAssert(
+            "captured lines not as expected:\n"
+            "expected but not found:\n"
+            "'b'"
+        ):
+            o.compare_lines('c', 'b', partial=True)
+
+    def test_unordered(self):
+        with OutputCapture() as o:
+            print('a\nb\na\nc 1')
+        o.compare_lines(S(r'c \d'), 'a', 'b', 'a', ordered=False)
+        with ShouldAssert(
+            "captured lines not as expected:\n"
+            "expected but not found:\n"
+            "'b'\n"
+            "<S:d>\n"
+            "unexpected lines:\n"
+            "line 3: 'a'\n"
+            "line 4: 'c 1'"
+        ):
+            o.compare_lines('a', 'b', 'b', S('d'), ordered=False)
+
+    def test_subset(self):
+        with OutputCapture() as o:
+            print('a\nb\nc')
+        o.compare_lines('c', 'a', ordered=False, partial=True)
+        with ShouldAssert(
+            "captured lines not as expected:\n"
+            "expected but not found:\n"
+            "'d'"
+        ):
+            o.compare_lines('c', 'd', ordered=False, partial=True)
+
+    def test_separate(self):
+        with OutputCapture(separate=True) as o:
+            print('out')
+            print('err', file=sys.stderr)
+        o.compare_lines('out', stream='stdout')
+        o.compare_lines('err', stream='stderr')
+        with ShouldAssert(
+            "stdout lines not as expected:\n"
+            "line 1: 'err' (expected) != 'out' (actual)"
+        ):
+            o.compare_lines('err', stream='stdout')
+
+    def test_while_capturing(self):
+        with OutputCapture() as o:
+            print('a\nb')
+            lines = o._lines(o.output)
+            compare(next(lines), expected='a')
+            print('c')
+            compare(list(lines), expected=['b'])
+        compare(o.captured, expected='a\nb\nc\n')
+
+    def test_spilled(self):
+        with OutputCapture(max_size=5) as o:
+            print('12345\n' + '日' * 100000)
+        o.compare_lines('12345', '日' * 100000)
+
+    def test_truncated(self):
+        with OutputCapture(max_size=5, overflow='truncate') as o:
+            for i in range(100):
+                print(i)
+        o.compare_lines('8', '99')
+
+    def test_fd(self, capfd):
+        with capfd.disabled(), OutputCapture(fd=True) as o:
+            call([sys.executable, '-c', "print('out\\n日')"])
+        o.compare_lines('out', '日')
+
+
+class TestPerContext:
+
+    def test_simple(self):
+        with OutputCapture(per_context=True) as o:
+            print('out')
+            print('err', file=sys.stderr)
+        o.compare('out\nerr')
+
+    def test_separate(self):
+        with OutputCapture(per_context=True, separate=True) as o:
+            print('out')
+            print('err', file=sys.stderr)
+        o.compare(stdout='out', stderr='err')
+
+    def test_other_contexts_not_captured(self):
+        with OutputCapture() as outer:
+            with OutputCapture(per_context=True) as inner:
+                print('inner')
+                thread = Thread(target=print, args=('thread',))
+                thread.start()
+                thread.join()
+        inner.compare('inner')
+        outer.compare('thread')
+
+    def test_threads(self):
+        barrier = Barrier(3)
+        captures = {}
+
+        def run(name):
+            with OutputCapture(per_context=True) as o:
+                barrier.wait()
+                for i in range(3):
+                    print(name, i)
+                    barrier.wait()
+            captures[name] = o
+
+        threads = [Thread(target=run, args=(name,)) for name in 'abc']
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for name, o in captures.items():
+            o.compare(f'{name} 0\n{name} 1\n{name} 2')
+
+    def test_tasks(self):
+        async def run(name):
+            with OutputCapture(per_context=True) as o:
+                for i in range(3):
+                    print(name, i)
+                    await asyncio.sleep(0)
+                    # a task started within the capture inherits its context:
+                    await asyncio.create_task(self.child(name))
+            return o
+
+        async def main():
+            return await asyncio.gather(run('a'), run('b'))
+
+        for name, o in zip('ab', asyncio.run(main())):
+            o.compare('\n'.join(f'{name} {i}\n{name} child' for i in range(3)))
+
+    @staticmethod
+    async def child(name):
+        print(name, 'child')
+
+    def test_nested(self):
+        with OutputCapture(per_context=True) as outer:
+            print('a')
+            with OutputCapture(per_context=True) as inner:
+                print('b')
+            print('c')
+        outer.compare('a\nc')
+        inner.compare('b')
+
+    def test_disable_and_enable(self):
+        with OutputCapture() as outer:
+            with OutputCapture(per_context=True) as o:
+                print('a')
+                o.disable()
+                print('b')
+                o.enable()
+                print('c')
+        o.compare('a\nc')
+        outer.compare('b')
+
+    def test_disable_in_other_context(self):
+        with OutputCapture() as outer:
+            with OutputCapture(per_context=True) as o:
+                print('a')
+                with ShouldRaise(ValueError(S('.+ was created in a different Context'))):
+                    copy_context().run(o.disable)
+                print('b')
+            print('c')
+        o.compare('a\nb')
+        outer.compare('c')
+
+    def test_streams_restored(self):
+        stdout, stderr = sys.stdout, sys.stderr
+        with OutputCapture(per_context=True):
+            assert sys.stdout is not stdout
+            with OutputCapture(per_context=True):
+                pass
+            assert sys.stdout is not stdout
+        assert sys.stdout is stdout
+        assert sys.stderr is stderr
+
+    def test_with_fd(self):
+        with ShouldRaise(TypeError('per_context cannot be used with fd=True')):
+            OutputCapture(per_context=True, fd=True)
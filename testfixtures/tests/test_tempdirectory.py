@@ -1,4 +1,6 @@
+import hashlib
 import os
+import re
 from pathlib import Path
 from tempfile import mkdtemp
 from unittest import TestCase
@@ -7,7 +9,8 @@ from warnings import catch_warnings
 from testfixtures.mock import Mock
 
 from testfixtures import (
-    TempDirectory, Replacer, ShouldRaise, compare, OutputCapture
+    TempDirectory, Replacer, ShouldRaise, compare, OutputCapture, FileHash, ShouldAssert,
+    Changes
 )
 from ..rmtree import rmtree
 
@@ -171,6 +174,51 @@ class TempDirectoryTests(TestCase):
                 'a/d/',
                 ])
 
+    def test_ignored_directory_not_walked(self):
+        with TempDirectory(ignore=[r'build/$']) as d:
+            d.write('build/lib/a', b'')
+            d.write('src/build', b'')
+            d.write('src/a', b'')
+            with Replacer() as replace:
+                scandir = replace('os.scandir', Mock(side_effect=os.scandir))
+                d.compare(['src/', 'src/a', 'src/build'])
+            compare(
+                sorted(c.args[0][len(d.path):] for c in scandir.call_args_list),
+                expected=['', os.sep + 'src'],
+            )
+
+    def test_ignore_multiple_patterns(self):
+        with TempDirectory(ignore=['(?i)FOO', r'\.pyc$']) as d:
+            d.write('foo/a', b'')
+            d.write('b.pyc', b'')
+            d.write('b.py', b'')
+            d.compare(['b.py'])
+            compare(d.actual(), expected=['b.py'])
+
+    def test_ignore_patterns_with_backreferences(self):
+        with TempDirectory(ignore=[r'(x)y', r'(a)\1']) as d:
+            d.write('aa', b'')
+            d.write('ax', b'')
+            d.write('xy', b'')
+            d.compare(['ax'])
+
+    def test_ignore_compiled_pattern_with_flags(self):
+        with TempDirectory(ignore=[re.compile('FOO', re.I), r'\.pyc$']) as d:
+            d.write('foo', b'')
+            d.write('b.pyc', b'')
+            d.write('b.py', b'')
+            d.compare(['b.py'])
+
+    def test_workers(self):
+        with TempDirectory(ignore=['.svn']) as d:
+            expected = []
+            for i in range(20):
+                d.write(f'{i}/.svn/rubbish', b'')
+                d.write(f'{i}/{i}/file', b'')
+                expected.extend([f'{i}/', f'{i}/{i}/', f'{i}/{i}/file'])
+            d.compare(expected, workers=4)
+            d.compare(expected[2::3], workers=4, files_only=True)
+
     def test_files_only(self):
         with TempDirectory() as d:
             d.write('a/b/c', b'')
@@ -340,6 +388,231 @@ class TempDirectoryTests(TestCase):
             os.chdir(original)
 
 
+class TestCompareContents:
+
+    def test_match(self):
+        with TempDirectory() as d:
+            d.write('a', b'bytes')
+            d.write('b/c', 'text \xa3', encoding='utf-8')
+            d.write('d', b'hashed')
+            d.compare_contents({
+                'a': b'bytes',
+                'b/c': 'text \xa3',
+                'd': FileHash(hashlib.sha256(b'hashed').hexdigest().upper()),
+            })
+
+    def test_mismatch(self):
+        with TempDirectory() as d:
+            d.write('a', b'actual')
+            d.write('b', b'same size')
+            d.write('c', 'text', encoding='ascii')
+            d.write('d', b'hashed')
+            with ShouldAssert(
+                "dict not as expected:\n"
+                "\n"
+                "in expected but not actual:\n"
+                "'e': b'missing'\n"
+                "\n"
+                "values differ:\n"
+                "'a': b'expected' (expected) != b'actual' (actual)\n"
+                "'b': b'SAME SIZE' (expected) != b'same size' (actual)\n"
+                "'c': 'other' (expected) != 'text' (actual)\n"
+                "'d': <FileHash md5:x> (expected) != <FileHash md5:df9f7c813fdc72029b41758ef8dbb528> (actual)\n"
+                "\n"
+                "While comparing ['a']: \n"
+                "b'expected' (expected)\n"
+                "!=\n"
+                "b'actual' (actual)\n"
+                "\n"
+                "While comparing ['b']: \n"
+                "b'SAME SIZE' (expected)\n"
+                "!=\n"
+                "b'same size' (actual)\n"
+                "\n"
+                "While comparing ['c']: 'other' (expected) != 'text' (actual)\n"
+                "\n"
+                "While comparing ['d']: FileHash not as expected:\n"
+                "\n"
+                "attributes same:\n"
+                "['algorithm', 'size']\n"
+                "\n"
+                "attributes differ:\n"
+                "'hexdigest': 'x' (expected) != 'df9f7c813fdc72029b41758ef8dbb528' (actual)\n"
+                "\n"
+                "While comparing ['d'].hexdigest: \n"
+                "'x' (expected)\n"
+                "!=\n"
+                "'df9f7c813fdc72029b41758ef8dbb528' (actual)"
+            ):
+                d.compare_contents({
+                    'a': b'expected',
+                    'b': b'SAME SIZE',
+                    'c': 'other',
+                    'd': FileHash('x', 'md5'),
+                    'e': b'missing',
+                }, encoding='ascii')
+
+    def test_size_checked_first(self):
+        with TempDirectory() as d, Replacer() as replace:
+            hexdigest = replace('testfixtures.tempdirectory._hexdigest', Mock(return_value='x'))
+            same_bytes = replace('testfixtures.tempdirectory._same_bytes', Mock())
+            d.write('a', b'abc')
+            with ShouldAssert(
+                "dict not as expected:\n"
+                "\n"
+                "values differ:\n"
+                "'a': <FileHash sha256:x, size=4> (expected) != <FileHash sha256:x, size=3> (actual)\n"
+                "\n"
+                "While comparing ['a']: FileHash not as expected:\n"
+                "\n"
+                "attributes same:\n"
+                "['algorithm', 'hexdigest']\n"
+                "\n"
+                "attributes differ:\n"
+                "'size': 4 (expected) != 3 (actual)"
+            ):
+                d.compare_contents({'a': FileHash('x', size=4)})
+            with ShouldAssert(
+                "dict not as expected:\n"
+                "\n"
+                "values differ:\n"
+                "'a': 'abcd' (expected) != 'abc' (actual)\n"
+                "\n"
+                "While comparing ['a']: 'abcd' (expected) != 'abc' (actual)"
+            ):
+                d.compare_contents({'a': 'abcd'})
+        # only hashed so the actual hash could be reported:
+        compare(hexdigest.call_count, expected=1)
+        compare(same_bytes.call_count, expected=0)
+
+    def test_large_files(self):
+        with TempDirectory() as d, Replacer() as replace:
+            replace('testfixtures.tempdirectory._MMAP_SIZE', 10)
+            content = bytes(range(256)) * 10
+            d.write('a', content)
+            d.compare_contents({'a': content})
+            d.compare_contents({'a': FileHash.of(content, 'md5', size=True)})
+            different = content[:-1] + b'x'
+            expected_hash = FileHash.of(different, size=True)
+            actual_hash = FileHash.of(content, size=True)
+            with ShouldRaise(AssertionError) as s:
+                d.compare_contents({'a': different})
+            assert f"'a': {expected_hash!r} (expected) != {actual_hash!r} (actual)" in str(s.raised)
+
+    def test_path_and_workers(self):
+        with TempDirectory() as d:
+            expected = {}
+            for i in range(50):
+                d.write(f'sub/{i}', str(i), encoding='ascii')
+                expected[str(i)] = str(i)
+            d.compare_contents(expected, path='sub', workers=4)
+            expected['10'] = 'x'
+            with ShouldAssert(
+                "dict not as expected:\n"
+                "\n"
+                "values differ:\n"
+                "'10': 'x' (expected) != '10' (actual)\n"
+                "\n"
+                "While comparing ['10']: 'x' (expected) != '10' (actual)"
+            ):
+                d.compare_contents(expected, path=('sub',), workers=4)
+
+    def test_default_encoding(self):
+        with TempDirectory(encoding='utf-16') as d:
+            d.write('a', 'text')
+            d.compare_contents({'a': 'text'})
+
+    def test_directory_expected_to_be_file(self):
+        with TempDirectory() as d:
+            d.makedir('sub')
+            with ShouldAssert(
+                "dict not as expected:\n"
+                "\n"
+                "values differ:\n"
+                "'sub': b'x' (expected) != <directory> (actual)\n"
+                "\n"
+                "While comparing ['sub']: b'x' (expected) != <directory> (actual)"
+            ):
+                d.compare_contents({'sub': b'x'})
+
+
+class TestSnapshot:
+
+    def test_changes(self):
+        with TempDirectory() as d:
+            d.write('same', b'same')
+            d.write('resized', b'a')
+            d.write('touched', b'a')
+            d.write('removed/file', b'')
+            d.makedir('dir')
+            snapshot = d.snapshot()
+            compare(sorted(snapshot.entries), expected=[
+                'dir/', 'removed/', 'removed/file', 'resized', 'same', 'touched'
+            ])
+            d.write('resized', b'ab')
+            stat = os.stat(d.as_string('touched'))
+            os.utime(d.as_string('touched'), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+            rmtree(d.as_string('removed'))
+            d.write('dir/added', b'')
+            compare(d.changes_since(snapshot), expected=Changes(
+                added=['dir/added'],
+                removed=['removed/', 'removed/file'],
+                modified=['resized', 'touched'],
+            ))
+
+    def test_no_changes(self):
+        with TempDirectory() as d:
+            d.write('a/b', b'')
+            snapshot = d.snapshot(workers=2)
+            changes = d.changes_since(snapshot, workers=2)
+            compare(changes, expected=Changes())
+            assert not changes
+
+    def test_replaced(self):
+        with TempDirectory() as d:
+            d.write('a', b'a')
+            d.write('b', b'b')
+            snapshot = d.snapshot()
+            stat = os.stat(d.as_string('a'))
+            os.replace(d.as_string('b'), d.as_string('a'))
+            os.utime(d.as_string('a'), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            compare(d.changes_since(snapshot), expected=Changes(removed=['b'], modified=['a']))
+
+    def test_path_and_ignore(self):
+        with TempDirectory(ignore=['.svn']) as d:
+            d.write('sub/a', b'')
+            d.write('other', b'')
+            snapshot = d.snapshot('sub')
+            compare(snapshot.entries.keys(), expected={'a'})
+            d.write('sub/.svn/entries', b'')
+            d.write('sub/b', b'')
+            d.write('other', b'changed')
+            compare(d.changes_since(snapshot), expected=Changes(added=['b']))
+
+    def test_changes_mismatch(self):
+        with ShouldAssert(
+            "Changes not as expected:\n"
+            "\n"
+            "attributes same:\n"
+            "['modified', 'removed']\n"
+            "\n"
+            "attributes differ:\n"
+            "'added': ['a'] (expected) != [] (actual)\n"
+            "\n"
+            "While comparing .added: sequence not as expected:\n"
+            "\n"
+            "same:\n"
+            "[]\n"
+            "\n"
+            "expected:\n"
+            "['a']\n"
+            "\n"
+            "actual:\n"
+            "[]"
+        ):
+            compare(Changes(), expected=Changes(added=['a']))
+
+
 def test_wrap_path(tmp_path: Path):
     with TempDirectory(tmp_path) as d:
         assert d.path == str(tmp_path)
@@ -1,9 +1,9 @@
-from twisted.logger import Logger, formatEvent
+from twisted.logger import Logger, formatEvent, globalLogPublisher
 from twisted.python.failure import Failure
 from twisted.trial.unittest import TestCase
 
 from testfixtures import compare, ShouldRaise, StringComparison as S, ShouldAssert
-from testfixtures.twisted import LogCapture, INFO
+from testfixtures.twisted import LogCapture, INFO, WARN, ERROR
 
 log = Logger()
 
@@ -164,3 +164,149 @@ class TestLogCapture(TestCase):
                 (INFO, 'Sent 1 Messages'),
                 order_matters=False
             )
+
+    def test_order_doesnt_matter_duplicates(self):
+        capture = LogCapture.make(self)
+        log.info('a')
+        log.info('b')
+        log.info('a')
+        capture.check(
+            (INFO, 'a'),
+            (INFO, 'a'),
+            (INFO, 'b'),
+            order_matters=False
+        )
+        with ShouldAssert(
+            "entries not as expected:\n"
+            "\n"
+            "expected and found:\n"
+            "[(<LogLevel=info>, 'a'), (<LogLevel=info>, 'b')]\n"
+            "\n"
+            "expected but not found:\n"
+            "[(<LogLevel=info>, 'b')]\n"
+            "\n"
+            "other entries:\n"
+            "[(<LogLevel=info>, 'a')]"
+        ):
+            capture.check(
+                (INFO, 'b'),
+                (INFO, 'a'),
+                (INFO, 'b'),
+                order_matters=False
+            )
+
+    def test_order_doesnt_matter_unhashable_actual(self):
+        capture = LogCapture.make(self, fields=('a',))
+        log.info('{a}', a=[1])
+        log.info('{a}', a=[2])
+        capture.check([2], [1], order_matters=False)
+
+    def test_rows_built_when_captured(self):
+        calls = []
+
+        def field(event):
+            calls.append(event['log_format'])
+            return event['log_format']
+
+        capture = LogCapture.make(self, fields=(field,))
+        log.info('a')
+        log.info('b')
+        capture.check('a', 'b')
+        capture.check('a', 'b')
+        compare(calls, expected=['a', 'b'])
+
+    def test_events_modified(self):
+        capture = LogCapture.make(self)
+        log.info('a')
+        log.info('b')
+        del capture.events[0]
+        capture.check((INFO, 'b'))
+        capture.events = []
+        log.info('c')
+        capture.check((INFO, 'c'))
+
+    def test_max_events(self):
+        capture = LogCapture.make(self, max_events=2)
+        log.info('a')
+        log.info('b')
+        log.info('c')
+        capture.check((INFO, 'b'), (INFO, 'c'))
+        compare(capture.dropped, expected=1)
+        compare(capture.events[0]['log_format'], expected='b')
+
+    def test_max_events_after_events_modified(self):
+        capture = LogCapture.make(self, max_events=2)
+        log.info('a')
+        log.info('b')
+        del capture.events[0]
+        capture.check((INFO, 'b'))
+        for i in range(10):
+            log.info(str(i))
+        compare(len(capture._rows), expected=2)
+        capture.check((INFO, '8'), (INFO, '9'))
+
+    def test_max_events_raise_logged_failure(self):
+        capture = LogCapture.make(self, max_events=2)
+        log.info('a')
+        try:
+            raise TypeError('all gone wrong')
+        except:
+            log.failure('oh dear')
+        log.info('b')
+        with ShouldRaise(Failure) as s:
+            capture.raise_logged_failure(start_index=0)
+        compare(s.raised.value, expected=TypeError('all gone wrong'))
+        self.flushLoggedErrors()
+
+    def test_raise_logged_failure_negative_start_index(self):
+        capture = LogCapture.make(self)
+        try:
+            raise ValueError('boom!')
+        except:
+            log.failure('oh dear')
+        log.info('fine')
+        capture.raise_logged_failure(start_index=-1)
+        with ShouldRaise(Failure):
+            capture.raise_logged_failure(start_index=-2)
+        self.flushLoggedErrors()
+
+    def test_failures(self):
+        capture = LogCapture.make(self, max_events=3)
+        for text in 'abc':
+            try:
+                raise ValueError(text)
+            except:
+                log.failure('oh dear')
+            log.info('fine')
+        compare([f.value for f in capture.failures], expected=[ValueError('c')])
+        del capture.events[0]
+        compare([f.value for f in capture.failures], expected=[ValueError('c')])
+        self.flushLoggedErrors()
+
+    def test_chain(self):
+        seen = []
+        globalLogPublisher.addObserver(seen.append)
+        self.addCleanup(globalLogPublisher.removeObserver, seen.append)
+        capture = LogCapture.make(self, chain=True)
+        log.info('hello')
+        capture.check((INFO, 'hello'))
+        compare([formatEvent(event) for event in seen], expected=['hello'])
+        capture.uninstall()
+        log.info('bye')
+        capture.check((INFO, 'hello'))
+        compare(len(seen), expected=2)
+
+    def test_prefilter(self):
+        capture = LogCapture.make(
+            self, namespaces=['testfixtures.tests', 'other'], level=WARN, chain=True
+        )
+        log.info('too low')
+        log.warn('captured')
+        Logger(namespace='other').error('also captured')
+        Logger(namespace='other.child').error('child')
+        Logger(namespace='otherwise').error('not captured')
+        capture.check(
+            (WARN, 'captured'),
+            (ERROR, 'also captured'),
+            (ERROR, 'child'),
+        )
@@ -1,12 +1,15 @@
 """
 Tools for helping to test Twisted applications.
 """
+from bisect import bisect_left
+from collections import deque
 from pprint import pformat
-from typing import Sequence, Callable, Any, TypeAlias, Self
+from typing import Deque, Sequence, Callable, Any, TypeAlias, Self
 from unittest import TestCase
 
 from constantly import NamedConstant
 from twisted.logger import globalLogPublisher, formatEvent, LogLevel, ILogObserver, LogEvent
+from twisted.python.failure import Failure
 
 from . import compare
 import zope.interface
@@ -23,24 +26,130 @@ class LogCapture:
       If they are callable, they will be called with the event as their only parameter.
       If only one field is specified, "actual" events will just be that one field;
       otherwise they will be a tuple of the specified fields.
+      The "actual" event is built when each event is captured.
+
+    :param max_events:
+      If supplied, only this number of the most recently captured events will be kept,
+      with older events being dropped as new ones are captured. The number of events
+      dropped is kept in :attr:`dropped`.
+
+    :param chain:
+      If ``True``, :meth:`install` will add this :class:`LogCapture` alongside
+      any existing observers rather than replacing them, so events will still
+      reach those observers.
+
+    :param namespaces:
+      If supplied, only events logged in these namespaces, or namespaces within
+      them, will be captured.
+
+    :param level:
+      If supplied, only events logged at this level or above will be captured.
     """
 
-    def __init__(self, fields: Sequence[str | Callable] = ('log_level', formatEvent,)):
-        #: The list of events captured.
-        self.events: list[LogEvent] = []
+    def __init__(
+            self,
+            fields: Sequence[str | Callable] = ('log_level', formatEvent,),
+            max_events: int | None = None,
+            chain: bool = False,
+            namespaces: Sequence[str] | None = None,
+            level: NamedConstant | None = None,
+    ):
         self.fields = fields
+        self.max_events = max_events
+        self.chain = chain
+        self.namespaces = namespaces
+        self._prefixes = tuple(namespace+'.' for namespace in namespaces or ())
+        self.level = level
+        #: The events captured.
+        self.events: list[LogEvent] | Deque[LogEvent]
+        self._rows: list[Any] | Deque[Any]
+        if max_events is None:
+            self.events = []
+            self._rows = []
+        else:
+            self.events = deque(maxlen=max_events)
+            self._rows = deque(maxlen=max_events)
+        self._rows_for = self.events
+        #: The number of events dropped when ``max_events`` is used.
+        self.dropped = 0
+        # The positions of events with failures, counting any dropped events:
+        self._failure_positions: Deque[int] = deque()
+
+    def _row(self, event: LogEvent) -> Any:
+        row = tuple(field(event) if callable(field) else event.get(field)
+                    for field in self.fields)
+        if len(row) == 1:
+            return row[0]
+        return row
 
     def __call__(self, event: LogEvent) -> None:
-        self.events.append(event)
+        if self.level is not None and event.get('log_level', self.level) < self.level:
+            return
+        if self.namespaces is not None:
+            namespace = event.get('log_namespace', '')
+            if namespace not in self.namespaces and not namespace.startswith(self._prefixes):
+                return
+        events = self.events
+        position = self.dropped + len(events)
+        if len(events) == self.max_events:
+            self.dropped += 1
+        if self._rows_for is events:
+            if event.get('log_failure') is not None:
+                self._failure_positions.append(position)
+            self._rows.append(self._row(event))
+        events.append(event)
+
+    def _sync(self) -> None:
+        # Make sure the rows and failure positions match the events:
+        events = self.events
+        if self._rows_for is not events or len(self._rows) != len(events):
+            # events has been replaced or modified:
+            rows = (self._row(event) for event in events)
+            if self.max_events is None:
+                self._rows = list(rows)
+            else:
+                self._rows = deque(rows, maxlen=self.max_events)
+            self._rows_for = events
+            self._failure_positions = deque(
+                self.dropped + index for index, event in enumerate(events)
+                if event.get('log_failure') is not None
+            )
+        positions = self._failure_positions
+        while positions and positions[0] < self.dropped:
+            positions.popleft()
+
+    def actual(self) -> list[Any]:
+        """
+        The "actual" events built from the captured events, as described for the
+        ``fields`` parameter to the constructor.
+        """
+        self._sync()
+        return list(self._rows)
+
+    @property
+    def failures(self) -> list[Failure]:
+        """
+        The failures logged in the events captured, found using an index of
+        the events that have failures rather than by examining every event.
+        """
+        self._sync()
+        return [self.events[position - self.dropped]['log_failure']
+                for position in self._failure_positions]
 
     def install(self) -> None:
         "Start capturing."
-        self.original_observers = globalLogPublisher._observers
-        globalLogPublisher._observers = [self]
+        if self.chain:
+            globalLogPublisher.addObserver(self)
+        else:
+            self.original_observers = globalLogPublisher._observers
+            globalLogPublisher._observers = [self]
 
     def uninstall(self) -> None:
         "Stop capturing."
-        globalLogPublisher._observers = self.original_observers
+        if self.chain:
+            globalLogPublisher.removeObserver(self)
+        else:
+            globalLogPublisher._observers = self.original_observers
 
     def check(self, *expected: LogEvent, order_matters: bool = True) -> None:
         """
@@ -51,27 +160,45 @@ class LogCapture:
           This defaults to ``True``. If ``False``, the order of expected logging versus
           actual logging will be ignored.
         """
-        actual_event: Any
-        actual = []
-        for event in self.events:
-            actual_event = tuple(field(event) if callable(field) else event.get(field)
-                            for field in self.fields)
-            if len(actual_event) == 1:
-                actual_event = actual_event[0]
-            actual.append(actual_event)
+        actual = self.actual()
         if order_matters:
             compare(expected=expected, actual=actual)
         else:
-            expected_ = list(expected)
+            # Hashable expected entries are found by hash, while any others,
+            # such as those containing comparison objects, are searched for:
+            by_hash: dict[Any, Deque[int]] = {}
+            unhashable = []
+            for index, entry in enumerate(expected):
+                try:
+                    by_hash.setdefault(entry, deque()).append(index)
+                except TypeError:
+                    unhashable.append(index)
+            found = [False] * len(expected)
             matched = []
             unmatched = []
             for entry in actual:
                 try:
-                    index = expected_.index(entry)
-                except ValueError:
+                    bucket = by_hash.get(entry)
+                except TypeError:
+                    bucket = None
+                match = bucket[0] if bucket else None
+                hashed = match is not None
+                for index in unhashable:
+                    if match is not None and index > match:
+                        break
+                    if expected[index] == entry:
+                        unhashable.remove(index)
+                        match = index
+                        hashed = False
+                        break
+                if hashed:
+                    bucket.popleft()  # type: ignore[union-attr]
+                if match is None:
                     unmatched.append(entry)
                 else:
-                    matched.append(expected_.pop(index))
+                    found[match] = True
+                    matched.append(expected[match])
+            expected_ = [entry for index, entry in enumerate(expected) if not found[index]]
             if expected_:
                 raise AssertionError((
                     'entries not as expected:\n\n'
@@ -96,13 +223,16 @@ class LogCapture:
 
         :param start_index: The index into :attr:`events` from where to start looking for failures.
         """
-        for event in self.events[start_index:]:
-            failure = event.get('log_failure')
-            if failure:
-                raise failure
+        self._sync()
+        if start_index < 0:
+            start_index = max(len(self.events) + start_index, 0)
+        positions = self._failure_positions
+        found = bisect_left(positions, self.dropped + start_index)
+        if found < len(positions):
+            raise self.events[positions[found] - self.dropped]['log_failure']
 
     @classmethod
-    def make(cls, testcase: TestCase, **kw: Sequence[str | Callable]) -> Self:
+    def make(cls, testcase: TestCase, **kw: Any) -> Self:
         """
         Instantiate, install and add a cleanup for a :class:`LogCapture`.
 